@@ -1,7 +1,11 @@
 import collections
+import copy
+import multiprocessing
 import numpy as np
 import numbers
-from typing import Any, List, Dict, Union, NamedTuple
+import os
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, List, Dict, Optional, Union, NamedTuple
 
 
 def most_frequent_value(elements: Any) -> Any:
@@ -22,6 +26,327 @@ def predicate(predicate_name, value, pivot):
         return value >= pivot
 
 
+# Gains closer than this are ties, broken in favour of the pivot seen first.
+TIE = 1e-12
+
+
+def xlog2x(x: Union[int, np.ndarray]) -> Union[float, np.ndarray]:
+    """x log2(x), with 0 log2(0) = 0. For label counts c summing to n,
+    n * entropy = xlog2x(n) - sum(xlog2x(c)).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    return x * np.log2(np.where(x > 0, x, 1))
+
+
+def first_positions(codes: np.ndarray, n_codes: int) -> np.ndarray:
+    """Position of the first occurrence of each code, len(codes) if absent."""
+    first = np.full(n_codes, len(codes))
+    # Writing in reverse leaves the earliest position of each code.
+    first[codes[::-1]] = np.arange(len(codes) - 1, -1, -1)
+    return first
+
+
+def majority(labels: np.ndarray) -> int:
+    """Most frequent label code, ties going to the one seen first like
+    most_frequent_value().
+    """
+    counts = np.bincount(labels)
+    candidates = np.flatnonzero(counts == counts.max())
+    return candidates[np.argmin(first_positions(labels, len(counts))[candidates])]
+
+
+def split_entropies(matched: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """n * entropy of the children, summed, for each candidate split.
+
+    Args:
+        matched (np.ndarray): (n_candidates, n_classes) label counts of the
+            matched child
+        counts (np.ndarray): (n_classes, ) label counts of the node
+    """
+    unmatched = counts - matched
+    return (
+        xlog2x(matched.sum(axis=1)) - xlog2x(matched).sum(axis=1)
+        + xlog2x(unmatched.sum(axis=1)) - xlog2x(unmatched).sum(axis=1)
+    )
+
+
+def numeric_splits(
+    col: np.ndarray, labels: np.ndarray, order: np.ndarray, counts: np.ndarray
+):
+    """Score value >= pivot for every distinct value of a numeric feature in a
+    single sweep over the node's rows sorted by value.
+
+    Returns:
+        (np.ndarray, np.ndarray, np.ndarray): split_entropies(), the pivots,
+            and the row where each pivot first occurs
+    """
+    values = col[order]
+    starts = np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+    # Label counts of the rows below each pivot, the unmatched child.
+    below = np.zeros((len(order) + 1, len(counts)), dtype=np.intp)
+    np.cumsum(np.eye(len(counts), dtype=np.intp)[labels[order]], axis=0, out=below[1:])
+    matched = counts - below[starts]
+    # order is stable, so the first row of a run of equal values is its earliest.
+    return split_entropies(matched, counts), values[starts], order[starts]
+
+
+def category_splits(
+    col: np.ndarray, labels: np.ndarray, idx: np.ndarray, counts: np.ndarray
+):
+    """Score value == pivot for every category of a categorical feature
+    present in the node, from one table of (category, label) counts.
+
+    Returns:
+        (np.ndarray, np.ndarray, np.ndarray): split_entropies(), the pivots,
+            and the row where each pivot first occurs
+    """
+    codes = col[idx]
+    n_codes = codes.max() + 1
+    table = np.bincount(
+        codes * len(counts) + labels[idx], minlength=n_codes * len(counts)
+    ).reshape(n_codes, len(counts))
+    pivots = np.flatnonzero(table.any(axis=1))
+    first = idx[first_positions(codes, n_codes)[pivots]]
+    return split_entropies(table[pivots], counts), pivots, first
+
+
+# Bin codes of a numeric feature fit in a uint8.
+MAX_BINS = 256
+
+
+def quantize(col: np.ndarray, n_bins: int) -> tuple:
+    """Bin codes of a numeric column and the lower edge of each bin. The
+    edges are the distinct values if there are at most n_bins of them, else
+    n_bins quantiles, so that the bins hold roughly equal numbers of rows.
+    """
+    edges = np.unique(col)
+    if len(edges) > n_bins:
+        quantiles = np.linspace(0, 1, n_bins, endpoint=False)
+        # inverted_cdf picks values of col, so every edge is a real pivot.
+        edges = np.unique(np.quantile(col, quantiles, method="inverted_cdf"))
+    bins = np.searchsorted(edges, col, side="right") - 1
+    return bins.astype(np.uint8), edges
+
+
+def histogram_splits(hist: np.ndarray, counts: np.ndarray, numeric: bool):
+    """Score a split at every bin of a feature from its label histogram: the
+    bin's lower edge as the pivot of a numeric feature, the bin itself (a
+    category) of a categorical one. O(bins), however many rows there are.
+
+    Args:
+        hist (np.ndarray): (n_bins, n_classes) label counts of each bin
+        counts (np.ndarray): (n_classes, ) label counts of the node
+        numeric (bool):
+
+    Returns:
+        (np.ndarray, np.ndarray): split_entropies() and the bins
+    """
+    present = np.flatnonzero(hist.any(axis=1))
+    if numeric:
+        # Rows in bin b or above match value >= edges[b].
+        matched = np.cumsum(hist[::-1], axis=0)[::-1][present]
+    else:
+        matched = hist[present]
+    return split_entropies(matched, counts), present
+
+
+def encode(values: List) -> tuple:
+    """Integer codes of values, numbered in order of first appearance, and
+    the distinct values.
+    """
+    index = {}
+    codes = np.fromiter(
+        (index.setdefault(v, len(index)) for v in values), np.intp, len(values)
+    )
+    return codes, list(index)
+
+
+class Columns:
+    """A list of dicts encoded column by column into NumPy arrays: numeric
+    features as they are, categorical features and the labels as integer
+    codes numbered in order of first appearance.
+    """
+
+    def __init__(
+        self,
+        features: List[str],
+        columns: List[np.ndarray],
+        numeric: List[bool],
+        categories: List[List],
+        labels: np.ndarray,
+        classes: List,
+    ):
+        self.features = features
+        self.columns = columns
+        self.numeric = numeric
+        # categories[j][code] is the value of a categorical feature j.
+        self.categories = categories
+        self.labels = labels
+        self.classes = classes
+
+    @classmethod
+    def from_records(cls, data: List[Dict], label_col: str) -> "Columns":
+        features = [f for f in data[0].keys() if f != label_col]
+        columns, numeric, categories = [], [], []
+        for ft in features:
+            values = [d[ft] for d in data]
+            if all(isinstance(v, numbers.Number) for v in values):
+                columns.append(np.asarray(values))
+                numeric.append(True)
+                categories.append(None)
+            else:
+                codes, uniques = encode(values)
+                columns.append(codes)
+                numeric.append(False)
+                categories.append(uniques)
+        labels, classes = encode([d[label_col] for d in data])
+        return cls(features, columns, numeric, categories, labels, classes)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @property
+    def schema(self) -> "Schema":
+        return Schema(self.features, self.numeric, self.categories, self.classes)
+
+    def matches(self, j: int, pivot: Any, rows: np.ndarray) -> np.ndarray:
+        """Whether feature j of each of rows satisfies the split predicate."""
+        if self.numeric[j]:
+            return self.columns[j][rows] >= pivot
+        return self.columns[j][rows] == pivot
+
+    def decode(self, j: int, pivot: Any) -> Any:
+        """The original value of a pivot of feature j."""
+        if self.numeric[j]:
+            return pivot.item()
+        return self.categories[j][pivot]
+
+
+class BinnedColumns:
+    """Columns with every numeric feature quantized into at most n_bins
+    bins, for histogram split finding. Bin b of a numeric feature holds the
+    values in [edges[b], edges[b + 1]); the bins of a categorical feature
+    are its codes.
+    """
+
+    def __init__(self, columns: Columns, n_bins: int):
+        self.columns = columns
+        self.bins, self.edges, self.n_bins = [], [], []
+        for j, col in enumerate(columns.columns):
+            if columns.numeric[j]:
+                bins, edges = quantize(col, n_bins)
+            else:
+                bins, edges = col, None
+            self.bins.append(bins)
+            self.edges.append(edges)
+            self.n_bins.append(
+                len(edges) if edges is not None else len(columns.categories[j])
+            )
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    def histograms(self, rows: np.ndarray) -> List[np.ndarray]:
+        """(n_bins, n_classes) label counts of each feature over rows."""
+        labels = self.columns.labels[rows]
+        n_classes = len(self.columns.classes)
+        return [
+            np.bincount(labels * nb + bins[rows], minlength=n_classes * nb)
+            .reshape(n_classes, nb)
+            .T
+            for bins, nb in zip(self.bins, self.n_bins)
+        ]
+
+    def matches(self, j: int, b: int, rows: np.ndarray) -> np.ndarray:
+        """Whether feature j of each of rows satisfies the split at bin b."""
+        if self.columns.numeric[j]:
+            return self.bins[j][rows] >= b
+        return self.bins[j][rows] == b
+
+    def decode(self, j: int, b: int) -> Any:
+        """The original value of the pivot of the split at bin b."""
+        if self.columns.numeric[j]:
+            return self.edges[j][b].item()
+        return self.columns.categories[j][b]
+
+
+class Schema(NamedTuple):
+    """What a fitted model keeps of its training Columns, to encode new data
+    the same way.
+    """
+
+    features: List[str]
+    numeric: List[bool]
+    categories: List[Optional[List]]
+    classes: List
+
+    def encode(self, X: Union[List[Dict], np.ndarray]) -> np.ndarray:
+        """A (n, n_features) float matrix of numeric features as they are and
+        categorical features as their codes, -1 for categories not seen in
+        training.
+
+        Args:
+            X (Union[List[Dict], np.ndarray]): dicts, or an array whose columns
+                are the features in the order of self.features
+        """
+        records = not isinstance(X, np.ndarray)
+        out = np.empty((len(X), len(self.features)))
+        for j, ft in enumerate(self.features):
+            col = [d[ft] for d in X] if records else X[:, j]
+            if self.numeric[j]:
+                out[:, j] = col
+            else:
+                index = {v: code for code, v in enumerate(self.categories[j])}
+                out[:, j] = np.fromiter((index.get(v, -1) for v in col), float, len(X))
+        return out
+
+    def labels(self) -> np.ndarray:
+        """The classes as an array, of object dtype unless they all have the
+        same type, which NumPy would otherwise coerce (e.g. 1 and 2.5 to
+        floats).
+        """
+        if len({type(c) for c in self.classes}) == 1:
+            labels = np.array(self.classes)
+            if labels.ndim == 1:
+                return labels
+        labels = np.empty(len(self.classes), dtype=object)
+        labels[:] = self.classes
+        return labels
+
+
+class FlatTree(NamedTuple):
+    """A tree as parallel arrays indexed by node, the root being node 0.
+    Split nodes send a row to matched[node] if feature[node] of the row is
+    >= threshold[node] (== if not numeric[node]), else to unmatched[node];
+    leaves have feature -1 and the class code of their label in value.
+    """
+
+    feature: np.ndarray
+    threshold: np.ndarray
+    numeric: np.ndarray
+    matched: np.ndarray
+    unmatched: np.ndarray
+    value: np.ndarray
+
+    def route(self, X: np.ndarray) -> np.ndarray:
+        """The class codes predicted for the rows of an encoded matrix,
+        moving all the rows down one level at a time.
+        """
+        node = np.zeros(len(X), dtype=np.intp)
+        active = np.flatnonzero(self.feature[node] >= 0)
+        while len(active):
+            current = node[active]
+            values = X[active, self.feature[current]]
+            threshold = self.threshold[current]
+            matched = np.where(
+                self.numeric[current], values >= threshold, values == threshold
+            )
+            current = np.where(matched, self.matched[current], self.unmatched[current])
+            node[active] = current
+            active = active[self.feature[current] >= 0]
+        return self.value[node]
+
+
 class DecisionTree:
     class Split(NamedTuple):
         subtree: Dict
@@ -34,11 +359,46 @@ class DecisionTree:
 
     Tree = Union[Split, Leaf]
 
-    def __init__(self, label_col: str, max_depth: int = 3):
+    def __init__(
+        self,
+        label_col: str,
+        max_depth: Optional[int] = None,
+        n_bins: Optional[int] = None,
+        n_jobs: Optional[int] = None,
+        task_rows: int = 20000,
+    ):
+        """
+        Args:
+            label_col (str):
+            max_depth (int, optional): None for no limit. Defaults to None.
+            n_bins (int, optional): find splits from histograms of the
+                numeric features quantized into at most n_bins (<= 256) bins,
+                instead of trying every distinct value. Defaults to None.
+            n_jobs (int, optional): fit with n_jobs threads scoring the
+                features of large nodes, and n_jobs processes building
+                the small subtrees; -1 for os.cpu_count(). Defaults to None,
+                a single thread.
+            task_rows (int, optional): nodes of more rows score their
+                features in parallel, subtrees of at most this many rows are
+                built as one task of the process pool. Defaults to 20000.
+        """
+        if n_bins is not None and not 2 <= n_bins <= MAX_BINS:
+            raise ValueError(f"n_bins must be between 2 and {MAX_BINS}")
+        if n_jobs is not None and n_jobs != -1 and n_jobs < 1:
+            raise ValueError("n_jobs must be >= 1, or -1 for all the cores")
         self.max_depth = max_depth
         self.min_leaf = 1
         self.label_col = label_col
         self.min_entropy_gain = 1e-1
+        # Nodes split on max_features features drawn at random, e.g. in a
+        # RandomForest, or on all of them if None.
+        self.max_features = None
+        self.seed = None
+        self.n_bins = n_bins
+        self.n_jobs = n_jobs
+        self.task_rows = task_rows
+        self._threads = None
+        self._processes = None
 
     def most_frequent_label(self, data: List[Dict]):
         labels = [d[self.label_col] for d in data]
@@ -64,60 +424,236 @@ class DecisionTree:
 
         return {"matched": matched, "unmatched": unmatched, "predicate": predicate_name}
 
+    def _stop(self, n: int, depth: int) -> bool:
+        """Whether a node of n rows at depth must be a leaf."""
+        too_deep = self.max_depth is not None and depth >= self.max_depth
+        return n <= self.min_leaf or too_deep
+
     def build_tree(self, data: List[Dict]) -> Tree:
-        if len(data) <= self.min_leaf:
-            return self.Leaf(self.most_frequent_label(data))
+        return self.grow(Columns.from_records(data, self.label_col))
+
+    def grow(
+        self,
+        columns: Union[Columns, BinnedColumns],
+        rows: Optional[np.ndarray] = None,
+    ) -> Tree:
+        """The tree of data already encoded as Columns.
 
-        features = [f for f in data[0].keys() if f != self.label_col]
+        Args:
+            columns (Union[Columns, BinnedColumns]): BinnedColumns, to fit
+                many trees on the same data quantized once, always find
+                splits from histograms
+            rows (np.ndarray, optional): indices of the rows to fit on, which
+                may repeat (e.g. a bootstrap sample). Defaults to None, all.
+        """
+        idx = np.arange(len(columns)) if rows is None else np.sort(rows)
+        if isinstance(columns, BinnedColumns) or self.n_bins is not None:
+            encoded = columns
+            if not isinstance(columns, BinnedColumns):
+                encoded = BinnedColumns(columns, self.n_bins)
+            build, state = self._build_binned, encoded.histograms(idx)
+        else:
+            encoded = columns
+            # Each numeric feature is sorted once; children inherit the order.
+            orders = {
+                j: idx[np.argsort(col[idx], kind="stable")]
+                for j, col in enumerate(columns.columns)
+                if columns.numeric[j]
+            }
+            build, state = self._build, orders
+
+        n_jobs = os.cpu_count() if self.n_jobs == -1 else self.n_jobs or 1
+        if n_jobs == 1:
+            return build(encoded, idx, state, 0)
+        # Workers get a serial copy, without the results of an earlier fit.
+        serial = copy.copy(self)
+        serial.n_jobs = None
+        for fitted in ["tree", "schema", "flat"]:
+            vars(serial).pop(fitted, None)
+        # Forking would copy the state of the threads into the workers.
+        context = multiprocessing.get_context("forkserver")
+        processes = ProcessPoolExecutor(
+            n_jobs,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(serial, encoded),
+        )
+        with ThreadPoolExecutor(n_jobs) as threads, processes:
+            self._threads, self._processes = threads, processes
+            try:
+                return resolve(build(encoded, idx, state, 0))
+            finally:
+                self._threads = self._processes = None
+
+    def _features(self, n_features: int, idx: np.ndarray, depth: int):
+        """The features a node may split on."""
+        if self.max_features is None or self.max_features >= n_features:
+            return range(n_features)
+        seed = None
+        if self.seed is not None:
+            # Seeded by the node itself, so that a tree comes out the same
+            # whichever process builds which subtree.
+            seed = [self.seed, depth, len(idx), int(idx[0])]
+        rng = np.random.default_rng(seed)
+        return np.sort(rng.choice(n_features, self.max_features, replace=False))
+
+    def _map(self, func, items, n_rows: int):
+        """map(func, items), on the thread pool for nodes of many rows."""
+        if self._threads is None or n_rows <= self.task_rows:
+            return map(func, items)
+        return self._threads.map(func, items)
+
+    def _subtree(self, build, data, idx: np.ndarray, state: Any, depth: int):
+        """build(data, idx, state, depth), or a Future of it from the process
+        pool if the subtree is small enough to be one task.
+        """
+        if self._processes is None or len(idx) > self.task_rows:
+            return build(data, idx, state, depth)
+        return self._processes.submit(_build_subtree, build.__name__, idx, state, depth)
+
+    def _build(
+        self, columns: Columns, idx: np.ndarray, orders: Dict, depth: int
+    ) -> Tree:
+        """Grow the subtree of the rows idx (ascending), whose numeric features
+        are sorted by orders.
+        """
+        labels = columns.labels[idx]
+        if self._stop(len(idx), depth):
+            return self.Leaf(columns.classes[majority(labels)])
+
+        counts = np.bincount(labels, minlength=len(columns.classes))
+        old_entropy = xlog2x(len(idx)) - xlog2x(counts).sum()
+
+        def score(j):
+            col = columns.columns[j]
+            if columns.numeric[j]:
+                return numeric_splits(col, columns.labels, orders[j], counts)
+            return category_splits(col, columns.labels, idx, counts)
 
-        checked_combo = set()
-        old_entropy = self.get_entropy(data)
         maximum_entropy_gain = 0
-        best_split = {}
-        for ft in features:
-            for dt in data:
-                combo = "_".join([ft, str(dt[ft])])
-                if combo not in checked_combo:
-                    checked_combo.add(combo)
-                    pivot = dt[ft]
-                    new_split = self.split(data, ft, pivot)
-                    new_entropy = (
-                        len(new_split["matched"]) * self.get_entropy(new_split["matched"])
-                        + len(new_split["unmatched"])
-                        * self.get_entropy(new_split["unmatched"])
-                    ) / len(data)
-                    entropy_gain = old_entropy - new_entropy
-                    if entropy_gain > maximum_entropy_gain:
-                        maximum_entropy_gain = entropy_gain
-                        print(new_split)
-                        best_split = self.Split(
-                            {
-                                "matched": new_split["matched"],
-                                "unmatched": new_split["unmatched"],
-                            },
-                            ft,
-                            pivot,
-                            new_split["predicate"],
-                        )
-
-        if maximum_entropy_gain < self.min_entropy_gain:
-            prediction = self.most_frequent_label(data)
-            return self.Leaf(prediction)
-
-        matched_tree = self.build_tree(best_split.subtree["matched"])
-        unmatched_tree = self.build_tree(best_split.subtree["unmatched"])
+        best_split = None
+        features = self._features(len(columns.features), idx, depth)
+        scores = self._map(score, features, len(idx))
+        for j, (new_entropy, pivots, first) in zip(features, scores):
+            gains = (old_entropy - new_entropy) / len(idx)
+            best = np.flatnonzero(gains >= gains.max() - TIE)
+            best = best[np.argmin(first[best])]
+            if gains[best] > maximum_entropy_gain + TIE:
+                maximum_entropy_gain = gains[best]
+                best_split = (j, pivots[best])
+
+        if best_split is None or maximum_entropy_gain < self.min_entropy_gain:
+            return self.Leaf(columns.classes[majority(labels)])
+
+        j, pivot = best_split
+        matched = columns.matches(j, pivot, idx)
+        children = {}
+        for name, side in [("matched", True), ("unmatched", False)]:
+            child_orders = {
+                k: order[columns.matches(j, pivot, order) == side]
+                for k, order in orders.items()
+            }
+            children[name] = self._subtree(
+                self._build, columns, idx[matched == side], child_orders, depth + 1
+            )
         return self.Split(
-            {"matched": matched_tree, "unmatched": unmatched_tree},
-            best_split.feature,
-            best_split.pivot,
-            best_split.predicate,
+            children,
+            columns.features[j],
+            columns.decode(j, pivot),
+            ">=" if columns.numeric[j] else "==",
+        )
+
+    def _build_binned(
+        self,
+        binned: BinnedColumns,
+        idx: np.ndarray,
+        hists: List[np.ndarray],
+        depth: int,
+    ) -> Tree:
+        """Grow the subtree of the rows idx from the label histograms hists of
+        its features. Ties go to the bin seen first, as in _build().
+        """
+        columns = binned.columns
+        if self._stop(len(idx), depth):
+            return self.Leaf(columns.classes[majority(columns.labels[idx])])
+
+        counts = hists[0].sum(axis=0)
+        old_entropy = xlog2x(len(idx)) - xlog2x(counts).sum()
+
+        def score(j):
+            return histogram_splits(hists[j], counts, columns.numeric[j])
+
+        maximum_entropy_gain = 0
+        best_split = None
+        features = self._features(len(hists), idx, depth)
+        scores = self._map(score, features, len(idx))
+        for j, (new_entropy, bins) in zip(features, scores):
+            gains = (old_entropy - new_entropy) / len(idx)
+            best = np.flatnonzero(gains >= gains.max() - TIE)
+            if len(best) > 1:
+                # Only ties need a pass over the rows, for the first of each bin.
+                first = first_positions(binned.bins[j][idx], binned.n_bins[j])
+                best = best[np.argmin(first[bins[best]])]
+            else:
+                best = best[0]
+            if gains[best] > maximum_entropy_gain + TIE:
+                maximum_entropy_gain = gains[best]
+                best_split = (j, bins[best])
+
+        if best_split is None or maximum_entropy_gain < self.min_entropy_gain:
+            return self.Leaf(columns.classes[majority(columns.labels[idx])])
+
+        j, b = best_split
+        matched = binned.matches(j, b, idx)
+        rows = {"matched": idx[matched], "unmatched": idx[~matched]}
+        # Only the smaller child is counted; the larger one's histograms are
+        # its parent's minus its sibling's.
+        small, large = sorted(rows, key=lambda name: len(rows[name]))
+        child_hists = {small: binned.histograms(rows[small])}
+        child_hists[large] = [h - s for h, s in zip(hists, child_hists[small])]
+        del hists
+        children = {}
+        for name in ["matched", "unmatched"]:
+            children[name] = self._subtree(
+                self._build_binned, binned, rows[name], child_hists.pop(name), depth + 1
+            )
+        return self.Split(
+            children,
+            columns.features[j],
+            binned.decode(j, b),
+            ">=" if columns.numeric[j] else "==",
         )
 
     def fit(self, data: List[Dict]) -> None:
-        self.tree = self.build_tree(data)
+        columns = Columns.from_records(data, self.label_col)
+        self.tree = self.grow(columns)
+        self.schema = columns.schema
+        self.flat = self.flatten()
+
+    def flatten(self) -> FlatTree:
+        """The fitted tree as a FlatTree, nodes numbered level by level."""
+        features = {ft: j for j, ft in enumerate(self.schema.features)}
+        classes = {c: code for code, c in enumerate(self.schema.classes)}
+        nodes = [self.tree]
+        fields = [[] for _ in FlatTree._fields]
+        for tree in nodes:
+            if isinstance(tree, self.Leaf):
+                row = (-1, 0, True, -1, -1, classes[tree.category])
+            else:
+                j = features[tree.feature]
+                numeric = tree.predicate == ">="
+                if numeric:
+                    threshold = tree.pivot
+                else:
+                    threshold = self.schema.categories[j].index(tree.pivot)
+                row = (j, threshold, numeric, len(nodes), len(nodes) + 1, -1)
+                nodes += [tree.subtree["matched"], tree.subtree["unmatched"]]
+            for field, x in zip(fields, row):
+                field.append(x)
+        dtypes = [np.intp, np.float64, bool, np.intp, np.intp, np.intp]
+        return FlatTree(*(np.array(f, dtype=t) for f, t in zip(fields, dtypes)))
 
     def traverse_tree(self, tree: Tree, datapoint: Dict) -> str:
-        print("current tree: {}".format(repr(tree)))
         try:
             feature = tree.feature
         except AttributeError:
@@ -132,6 +668,42 @@ class DecisionTree:
     def predict(self, datapoint: Dict) -> str:
         return self.traverse_tree(self.tree, datapoint)
 
+    def predict_batch(self, X: Union[List[Dict], np.ndarray]) -> np.ndarray:
+        """Predictions for many rows at once, through the flattened tree.
+
+        Args:
+            X (Union[List[Dict], np.ndarray]): dicts, or an array whose columns
+                are the features in the order of self.schema.features
+
+        Returns:
+            np.ndarray: (n, ) labels
+        """
+        return self.schema.labels()[self.flat.route(self.schema.encode(X))]
+
+
+# State of a process-pool worker: the tree being fitted and its encoded data.
+_fitting = {}
+
+
+def _init_worker(model: "DecisionTree", data: Union["Columns", "BinnedColumns"]):
+    _fitting["model"] = model
+    _fitting["data"] = data
+
+
+def _build_subtree(method: str, idx: np.ndarray, state: Any, depth: int):
+    model = _fitting["model"]
+    return getattr(model, method)(_fitting["data"], idx, state, depth)
+
+
+def resolve(tree):
+    """Replace the subtrees still being built by workers with their results."""
+    if isinstance(tree, Future):
+        return tree.result()
+    if isinstance(tree, DecisionTree.Split):
+        for name, subtree in tree.subtree.items():
+            tree.subtree[name] = resolve(subtree)
+    return tree
+
 
 if __name__ == "__main__":
     # mock data
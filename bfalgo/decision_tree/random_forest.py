@@ -0,0 +1,241 @@
+"""A random forest of DecisionTrees.
+
+Every tree is fitted on a bootstrap sample of the rows, choosing each split
+among a random subset of max_features features, and the forest predicts the
+label most trees vote for.
+
+The training data is encoded once, and with n_bins quantized once for all
+the trees. With n_jobs, the trees are fitted on a process pool whose workers
+attach to the encoded (or binned) columns in multiprocessing.shared_memory
+blocks, so only a seed crosses a process boundary on the way in and a tree
+on the way out.
+
+    >>> forest = RandomForest(label_col="label", n_trees=100, n_jobs=-1)
+    >>> forest.fit(data)
+    >>> forest.predict_batch(X)
+
+Ref:
+1. Breiman, "Random Forests"
+"""
+import copy
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+from bfalgo.decision_tree.decision_tree_annotated_oop import (
+    BinnedColumns,
+    Columns,
+    DecisionTree,
+)
+
+# State of a process-pool worker: the forest and the shared training data.
+_fitting = {}
+
+
+def _create(array: np.ndarray):
+    shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+    shared = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+    shared[...] = array
+    return shm, shared
+
+
+def _attach(name: str, shape: tuple, dtype: str):
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+Data = Union[Columns, BinnedColumns]
+
+
+def _split_arrays(data: Data) -> tuple:
+    """The arrays of data that trees are fitted from, and data without them.
+    Trees fitted from BinnedColumns need the bins, not the columns.
+    """
+    template = copy.copy(data)
+    if isinstance(data, Columns):
+        template.columns = template.labels = None
+        return template, data.columns + [data.labels]
+    template.bins = None
+    template.columns = copy.copy(data.columns)
+    template.columns.columns = template.columns.labels = None
+    return template, data.bins + [data.columns.labels]
+
+
+def _join_arrays(template: Data, arrays: List[np.ndarray]) -> Data:
+    """The inverse of _split_arrays()."""
+    data = copy.copy(template)
+    if isinstance(data, Columns):
+        data.columns, data.labels = arrays[:-1], arrays[-1]
+    else:
+        data.bins = arrays[:-1]
+        data.columns = copy.copy(data.columns)
+        data.columns.labels = arrays[-1]
+    return data
+
+
+def _init_worker(forest: "RandomForest", template: Data, blocks: List):
+    # The shared memory stays attached for the life of the worker.
+    shms, arrays = [], []
+    for name, shape, dtype in blocks:
+        shm, array = _attach(name, shape, dtype)
+        shms.append(shm)
+        arrays.append(array)
+    _fitting.update(forest=forest, data=_join_arrays(template, arrays), shms=shms)
+
+
+def _fit_tree(seed: np.random.SeedSequence) -> DecisionTree.Tree:
+    return _fitting["forest"].fit_tree(_fitting["data"], seed)
+
+
+class RandomForest:
+    def __init__(
+        self,
+        label_col: str,
+        n_trees: int = 100,
+        max_features: Union[str, int, float, None] = "sqrt",
+        bootstrap: bool = True,
+        max_depth: Optional[int] = None,
+        n_bins: Optional[int] = None,
+        min_entropy_gain: float = 0.0,
+        n_jobs: Optional[int] = None,
+        seed: Optional[int] = None,
+    ):
+        """
+        Args:
+            label_col (str):
+            n_trees (int, optional): Defaults to 100.
+            max_features (Union[str, int, float, None], optional): features
+                to choose from at each split: "sqrt" of them, a number, a
+                fraction, or None for all. Defaults to "sqrt".
+            bootstrap (bool, optional): fit every tree on n rows drawn with
+                replacement, instead of all of them. Defaults to True.
+            max_depth (int, optional): of the trees. Defaults to None.
+            n_bins (int, optional): of the trees. Defaults to None.
+            min_entropy_gain (float, optional): of the trees. Defaults to 0.0,
+                trees grown until their leaves are pure, whose variance the
+                vote averages out.
+            n_jobs (int, optional): fit the trees on n_jobs processes; -1 for
+                os.cpu_count(). Defaults to None, in this process.
+            seed (int, optional): the forest is the same for the same seed,
+                whatever n_jobs. Defaults to None.
+        """
+        if n_trees < 1:
+            raise ValueError("n_trees must be >= 1")
+        if n_jobs is not None and n_jobs != -1 and n_jobs < 1:
+            raise ValueError("n_jobs must be >= 1, or -1 for all the cores")
+        self.label_col = label_col
+        self.n_trees = n_trees
+        self.max_features = max_features
+        self.bootstrap = bootstrap
+        self.n_jobs = n_jobs
+        self.seed = seed
+        self.template = DecisionTree(label_col, max_depth=max_depth, n_bins=n_bins)
+        self.template.min_entropy_gain = min_entropy_gain
+
+    def n_features(self, total: int) -> int:
+        """How many of total features each split chooses from."""
+        if self.max_features is None:
+            return total
+        if isinstance(self.max_features, bool):
+            raise ValueError(f"Unknown max_features {self.max_features}")
+        if self.max_features == "sqrt":
+            return max(1, math.isqrt(total))
+        if isinstance(self.max_features, float) and 0 < self.max_features <= 1:
+            return max(1, int(self.max_features * total))
+        if isinstance(self.max_features, int) and self.max_features >= 1:
+            return min(total, self.max_features)
+        raise ValueError(f"Unknown max_features {self.max_features}")
+
+    def fit_tree(self, data: Data, seed: np.random.SeedSequence):
+        """Fit one tree on a random sample of the rows.
+
+        Returns:
+            DecisionTree.Tree:
+        """
+        rng = np.random.default_rng(seed)
+        rows = rng.integers(0, len(data), len(data)) if self.bootstrap else None
+        model = copy.copy(self.template)
+        model.seed = int(rng.integers(2**63))
+        return model.grow(data, rows)
+
+    def fit(self, data: List[Dict]) -> None:
+        columns = Columns.from_records(data, self.label_col)
+        self.template.max_features = self.n_features(len(columns.features))
+        encoded = columns
+        if self.template.n_bins is not None:
+            encoded = BinnedColumns(columns, self.template.n_bins)
+        seeds = np.random.SeedSequence(self.seed).spawn(self.n_trees)
+        n_jobs = os.cpu_count() if self.n_jobs == -1 else self.n_jobs or 1
+        if n_jobs == 1:
+            trees = [self.fit_tree(encoded, seed) for seed in seeds]
+        else:
+            trees = self._fit_parallel(encoded, seeds, n_jobs)
+
+        self.schema = columns.schema
+        self.trees = []
+        for tree in trees:
+            model = copy.copy(self.template)
+            model.tree, model.schema = tree, self.schema
+            # Flattened against all the features, so that every tree reads
+            # the same encoded matrix.
+            model.flat = model.flatten()
+            self.trees.append(model)
+
+    def _fit_parallel(self, data: Data, seeds: List, n_jobs: int) -> List:
+        shms, blocks = [], []
+        # Workers get the data without its arrays, and attach to them, and
+        # the forest without any trees of an earlier fit.
+        template, arrays = _split_arrays(data)
+        try:
+            for array in arrays:
+                shm, shared = _create(array)
+                shms.append(shm)
+                blocks.append((shm.name, array.shape, array.dtype.str))
+                del shared
+            forest = copy.copy(self)
+            forest.trees = None
+            # As in DecisionTree, no fork of a process that may run threads.
+            with ProcessPoolExecutor(
+                n_jobs,
+                mp_context=multiprocessing.get_context("forkserver"),
+                initializer=_init_worker,
+                initargs=(forest, template, blocks),
+            ) as pool:
+                return list(pool.map(_fit_tree, seeds))
+        finally:
+            for shm in shms:
+                shm.close()
+                shm.unlink()
+
+    def votes(self, X: Union[List[Dict], np.ndarray]) -> np.ndarray:
+        """(n, n_classes) number of trees voting for each class.
+
+        Args:
+            X (Union[List[Dict], np.ndarray]): dicts, or an array whose columns
+                are the features in the order of self.schema.features
+        """
+        X = self.schema.encode(X)
+        n_classes = len(self.schema.classes)
+        codes = np.stack([tree.flat.route(X) for tree in self.trees])
+        # One bincount over (row, class) pairs of all the trees.
+        codes += n_classes * np.arange(len(X))
+        return np.bincount(codes.ravel(), minlength=len(X) * n_classes).reshape(
+            len(X), n_classes
+        )
+
+    def predict_batch(self, X: Union[List[Dict], np.ndarray]) -> np.ndarray:
+        """The majority vote of the trees, ties going to the class seen first
+        in training.
+
+        Returns:
+            np.ndarray: (n, ) labels
+        """
+        return self.schema.labels()[np.argmax(self.votes(X), axis=1)]
+
+    def predict(self, datapoint: Dict):
+        return self.predict_batch([datapoint]).tolist()[0]
@@ -0,0 +1,145 @@
+"""Activation functions, looked up by name in a registry.
+
+Each activation computes its output in place and supplies its own
+derivative, expressed in terms of the output a = f(z), which is what the
+backward pass has at hand:
+
+    sigmoid   a = 1 / (1 + e^-z)        da/dz = a (1 - a)
+    tanh      a = tanh(z)               da/dz = 1 - a^2
+    linear    a = z                     da/dz = 1
+    relu      a = max(z, 0)             da/dz = 1 if a > 0 else 0
+    softmax   a_i = e^z_i / sum_j e^z_j  (rows; only as the output layer
+                                          under the cross-entropy loss)
+
+New activations register with @register_activation("name").
+"""
+import numpy as np
+
+
+ACTIVATIONS = {}
+
+
+def register_activation(name):
+    """Class decorator adding an Activation to ACTIVATIONS under name."""
+
+    def register(cls):
+        cls.name = name
+        ACTIVATIONS[name] = cls
+        return cls
+
+    return register
+
+
+def get_activation(kind):
+    """An Activation instance from a name, or kind itself if it is one.
+
+    Raises:
+        ValueError: if the name is not registered
+    """
+    if isinstance(kind, Activation):
+        return kind
+    if kind not in ACTIVATIONS:
+        raise ValueError(f"Unknown activation {kind}")
+    return ACTIVATIONS[kind]()
+
+
+class Activation:
+    name = None
+    elementwise = True  # derivative() is da_i/dz_i, independent of the other units
+
+    def forward(self, z):
+        """f(z) in new memory."""
+        return self.forward_inplace(np.array(z, dtype=np.result_type(z, np.float32)))
+
+    def forward_inplace(self, z):
+        """f(z) in z's own memory.
+
+        Args:
+            z (np.ndarray): overwritten with the output
+
+        Returns:
+            np.ndarray: z
+        """
+        raise NotImplementedError
+
+    def derivative(self, a, out=None):
+        """da/dz in terms of the output a.
+
+        Args:
+            a (np.ndarray):
+            out (np.ndarray, optional): where to write; must not be a.
+                Defaults to None (new memory).
+
+        Returns:
+            np.ndarray:
+        """
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"{type(self).__name__}()"
+
+
+@register_activation("sigmoid")
+class Sigmoid(Activation):
+    def forward_inplace(self, z):
+        np.negative(z, out=z)
+        # exp overflows to inf for large -z, which still gives the right 0.
+        with np.errstate(over="ignore"):
+            np.exp(z, out=z)
+        z += 1
+        return np.reciprocal(z, out=z)
+
+    def derivative(self, a, out=None):
+        out = np.subtract(1, a, out=out)
+        out *= a
+        return out
+
+
+@register_activation("tanh")
+class Tanh(Activation):
+    def forward_inplace(self, z):
+        return np.tanh(z, out=z)
+
+    def derivative(self, a, out=None):
+        out = np.square(a, out=out)
+        np.subtract(1, out, out=out)
+        return out
+
+
+@register_activation("linear")
+class Linear(Activation):
+    def forward_inplace(self, z):
+        return z
+
+    def derivative(self, a, out=None):
+        if out is None:
+            return np.ones_like(a)
+        out.fill(1)
+        return out
+
+
+@register_activation("relu")
+class ReLU(Activation):
+    def forward_inplace(self, z):
+        return np.maximum(z, 0, out=z)
+
+    def derivative(self, a, out=None):
+        if out is None:
+            return (a > 0).astype(a.dtype)
+        return np.greater(a, 0, out=out)
+
+
+@register_activation("softmax")
+class Softmax(Activation):
+    elementwise = False
+
+    def forward_inplace(self, z):
+        # Shifting by the row max keeps exp from overflowing.
+        z -= z.max(axis=-1, keepdims=True)
+        np.exp(z, out=z)
+        z /= z.sum(axis=-1, keepdims=True)
+        return z
+
+    def derivative(self, a, out=None):
+        raise ValueError("softmax has no element-wise derivative; use it with "
+                         "the cross_entropy loss")
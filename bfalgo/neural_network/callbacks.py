@@ -0,0 +1,159 @@
+"""Training callbacks for Network.SGD().
+
+A callback receives the network at the start and end of training, of every
+epoch, and after every batch. Evaluator moves the periodic accuracy checks
+out of the training loop: it evaluates a snapshot of the parameters, on
+subsamples of the data if asked to, and can do so on a background thread or
+process while training carries on.
+
+    >>> ev = Evaluator({"Test": (test_X, test_y)}, every=100, subsample=2000,
+    ...                background="thread")
+    >>> network.SGD(X, y, callbacks=[ev])
+    >>> ev.history[-1]
+    {'epoch': 9, 'batch': 900, 'label': 'Test', 'accuracy': 0.94}
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+
+class Callback:
+    """Base class; every hook does nothing."""
+
+    def on_train_begin(self, net):
+        pass
+
+    def on_epoch_begin(self, net, epoch):
+        pass
+
+    def on_batch_end(self, net, epoch, batch):
+        pass
+
+    def on_epoch_end(self, net, epoch):
+        pass
+
+    def on_train_end(self, net):
+        pass
+
+
+# Datasets of an Evaluator in a background process, sent once by the pool
+# initializer instead of with every evaluation.
+_worker_datasets = None
+
+
+def _init_worker(datasets):
+    global _worker_datasets
+    _worker_datasets = datasets
+
+
+def _evaluate_in_worker(net, label, batch_size):
+    X, y = _worker_datasets[label]
+    return net.evaluate(X, y, batch_size=batch_size)
+
+
+class Evaluator(Callback):
+    def __init__(self, datasets, every=50, subsample=None, background=None,
+                 batch_size=1024, verbose=True, seed=0):
+        """
+        Args:
+            datasets (dict): label -> (X, y), e.g. {"Test": (test_X, test_y)}
+            every (int, optional): evaluate after every `every` batches of an
+                epoch, starting with the first. Defaults to 50.
+            subsample (int, optional): evaluate on this many rows of each
+                dataset, drawn once so that evaluations stay comparable.
+                Defaults to None (all rows).
+            background (str, optional): None to evaluate on the training
+                thread, "thread" or "process" to evaluate a snapshot of the
+                parameters on a worker while training goes on. Defaults to
+                None.
+            batch_size (int, optional): chunk size of Network.evaluate().
+                Defaults to 1024.
+            verbose (bool, optional): print progress and accuracies. Defaults
+                to True.
+            seed (int, optional): seed of the subsampling. Defaults to 0.
+        """
+        if background not in (None, "thread", "process"):
+            raise ValueError(f"Unknown background {background}")
+        self.datasets = datasets
+        self.every = every
+        self.subsample = subsample
+        self.background = background
+        self.batch_size = batch_size
+        self.verbose = verbose
+        self.seed = seed
+        self.history = []
+        self._data = None
+        self._lock = threading.Lock()
+        self._pool = None
+        self._futures = []
+
+    def _subsampled(self):
+        rng = np.random.default_rng(self.seed)
+        datasets = {}
+        for label, (X, y) in self.datasets.items():
+            if self.subsample is not None and self.subsample < len(X):
+                idx = np.sort(rng.choice(len(X), self.subsample, replace=False))
+                X, y = X[idx], y[idx]
+            datasets[label] = (X, y)
+        return datasets
+
+    def _record(self, epoch, batch, label, accuracy):
+        with self._lock:
+            self.history.append(
+                {"epoch": epoch, "batch": batch, "label": label, "accuracy": accuracy}
+            )
+        if self.verbose:
+            print(f"{label} data: accuracy {accuracy:.3f} "
+                  f"(epoch {epoch + 1}, batch {batch}).")
+
+    def on_train_begin(self, net):
+        self._data = self._subsampled()
+        if self.background == "thread":
+            self._pool = ThreadPoolExecutor(max_workers=1)
+        elif self.background == "process":
+            # Not forked: a BatchLoader may be prefetching on a thread.
+            self._pool = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context("forkserver"),
+                initializer=_init_worker,
+                initargs=(self._data,),
+            )
+
+    def on_batch_end(self, net, epoch, batch):
+        if batch % self.every:
+            return
+        if self.verbose:
+            print(f"Now the {batch}th batch of epoch {epoch + 1}(/{net.epochs}).")
+        if self._pool is None:
+            for label, (X, y) in self._data.items():
+                accuracy = net.evaluate(X, y, batch_size=self.batch_size)
+                self._record(epoch, batch, label, accuracy)
+            return
+
+        # Training keeps updating the parameters in place; the worker gets
+        # its own copy.
+        snapshot = net.snapshot()
+        for label, (X, y) in self._data.items():
+            if self.background == "thread":
+                future = self._pool.submit(
+                    snapshot.evaluate, X, y, batch_size=self.batch_size
+                )
+            else:
+                future = self._pool.submit(
+                    _evaluate_in_worker, snapshot, label, self.batch_size
+                )
+            future.add_done_callback(
+                lambda f, e=epoch, b=batch, l=label: self._record(e, b, l, f.result())
+            )
+            self._futures.append(future)
+
+    def on_train_end(self, net):
+        """Wait for the pending evaluations."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        for future in self._futures:
+            future.result()
+        self._futures = []
@@ -0,0 +1,152 @@
+"""Shuffled mini-batches for training.
+
+A BatchLoader draws one permutation per epoch and gathers each batch into
+preallocated contiguous buffers with np.take(out=), so an epoch allocates
+nothing per batch. With prefetch=True, a background thread gathers the next
+batch into a second pair of buffers while the current one is being trained
+on (NumPy releases the GIL while copying).
+
+    >>> loader = BatchLoader(X, y, batch_size=50, seed=0)
+    >>> for epoch in range(10):
+    ...     for x_batch, y_batch in loader:
+    ...         ...
+
+The arrays yielded are views of the loader's buffers, valid until the next
+batch is requested; copy them to keep them.
+"""
+import queue
+import threading
+
+import numpy as np
+
+
+def gather(src, idx, out):
+    """out[:] = src[idx], without a temporary copy when the dtypes agree.
+
+    Args:
+        src (np.ndarray): (None, n)
+        idx (np.ndarray): row indices
+        out (np.ndarray): (len(idx), n)
+
+    Returns:
+        np.ndarray: out
+    """
+    if src.dtype == out.dtype:
+        return np.take(src, idx, axis=0, out=out)
+    out[...] = src[idx]
+    return out
+
+
+class BatchLoader:
+    def __init__(self, X, y, batch_size=50, shuffle=True, drop_last=False,
+                 prefetch=False, seed=None, dtype=None):
+        """
+        Args:
+            X (np.ndarray): (None, n_in)
+            y (np.ndarray): (None, n_out), or (None, ) labels
+            batch_size (int, optional): Defaults to 50.
+            shuffle (bool, optional): a new permutation every epoch. Defaults
+                to True.
+            drop_last (bool, optional): skip the last batch if it is partial.
+                Defaults to False.
+            prefetch (bool, optional): gather the next batch on a background
+                thread. Defaults to False.
+            seed (int, optional): seed of the permutations, so that runs are
+                repeatable. Defaults to None, which draws them from
+                np.random's global state.
+            dtype (np.dtype, optional): dtype of the batches. Defaults to
+                None, the dtypes of X and y.
+        """
+        if len(X) != len(y):
+            raise ValueError(f"X has {len(X)} rows but y has {len(y)}")
+        if batch_size < 1:
+            raise ValueError("batch_size must be >= 1")
+        self.X = X
+        self.y = y
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.prefetch = prefetch
+        self.rng = None if seed is None else np.random.default_rng(seed)
+        self.dtype = dtype
+        x_dtype = X.dtype if dtype is None else dtype
+        y_dtype = y.dtype if dtype is None else dtype
+        self._buffers = [
+            (
+                np.empty((batch_size,) + X.shape[1:], dtype=x_dtype),
+                np.empty((batch_size,) + y.shape[1:], dtype=y_dtype),
+            )
+            for _ in range(2 if prefetch else 1)
+        ]
+
+    def __len__(self):
+        """Number of batches per epoch."""
+        if self.drop_last:
+            return len(self.X) // self.batch_size
+        return -(-len(self.X) // self.batch_size)
+
+    def permutation(self):
+        """Row order of the next epoch."""
+        if not self.shuffle:
+            return np.arange(len(self.X))
+        if self.rng is None:
+            return np.random.permutation(len(self.X))
+        return self.rng.permutation(len(self.X))
+
+    def _index_batches(self, order):
+        return [
+            order[start : start + self.batch_size]
+            for start in range(0, len(self) * self.batch_size, self.batch_size)
+        ]
+
+    def _fill(self, k, idx):
+        x_buf, y_buf = self._buffers[k]
+        n = len(idx)
+        gather(self.X, idx, x_buf[:n])
+        gather(self.y, idx, y_buf[:n])
+        return x_buf[:n], y_buf[:n]
+
+    def __iter__(self):
+        """One epoch of (x_batch, y_batch). The permutation is drawn here,
+        not when iteration starts.
+        """
+        batches = self._index_batches(self.permutation())
+        if self.prefetch:
+            return self._prefetched(batches)
+        return (self._fill(0, idx) for idx in batches)
+
+    def _prefetched(self, batches):
+        free = queue.Queue()
+        ready = queue.Queue()
+        stop = threading.Event()
+        for k in range(len(self._buffers)):
+            free.put(k)
+
+        def produce():
+            try:
+                for idx in batches:
+                    k = free.get()
+                    if stop.is_set():
+                        return
+                    ready.put((k, self._fill(k, idx)))
+            except BaseException as e:
+                ready.put((None, e))
+                return
+            ready.put((None, None))
+
+        thread = threading.Thread(target=produce, daemon=True)
+        thread.start()
+        try:
+            while True:
+                k, item = ready.get()
+                if k is None:
+                    if item is not None:
+                        raise item
+                    return
+                yield item
+                # The consumer is done with buffer k once it asks for more.
+                free.put(k)
+        finally:
+            stop.set()
+            free.put(0)  # unblock the producer if it waits for a buffer
+            thread.join()
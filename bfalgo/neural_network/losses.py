@@ -0,0 +1,121 @@
+"""Loss functions, looked up by name in a registry.
+
+A loss gives the value of L(a_L, y) and the error of the output layer,
+delta_L = dL/dz_L, from which backprop starts. For cross-entropy on top of
+softmax (or sigmoid) the chain rule collapses to delta_L = a_L - y, so the
+fused kernel never evaluates the activation's derivative, and can write
+delta_L over the probabilities themselves.
+
+New losses register with @register_loss("name").
+"""
+import numpy as np
+
+
+LOSSES = {}
+
+
+def register_loss(name):
+    """Class decorator adding a Loss to LOSSES under name."""
+
+    def register(cls):
+        cls.name = name
+        LOSSES[name] = cls
+        return cls
+
+    return register
+
+
+def get_loss(kind):
+    """A Loss instance from a name, or kind itself if it is one.
+
+    Raises:
+        ValueError: if the name is not registered
+    """
+    if isinstance(kind, Loss):
+        return kind
+    if kind not in LOSSES:
+        raise ValueError(f"Unknown loss {kind}")
+    return LOSSES[kind]()
+
+
+class Loss:
+    name = None
+    # delta() may write over a_L (its out may be a_L).
+    fused = False
+
+    def check(self, activation):
+        """Raise ValueError if the loss cannot sit on top of activation."""
+
+    def value(self, a_L, y, activation=None):
+        """Loss summed over the batch.
+
+        Args:
+            a_L (np.ndarray): (None, n_L) output of the last layer
+            y (np.ndarray): (None, n_L) label
+            activation (Activation, optional): of the last layer
+
+        Returns:
+            float:
+        """
+        raise NotImplementedError
+
+    def delta(self, a_L, y, activation, out=None, tmp=None):
+        """dL/dz_L of the output layer.
+
+        Args:
+            a_L (np.ndarray): (None, n_L) output of the last layer
+            y (np.ndarray): (None, n_L) label
+            activation (Activation): of the last layer
+            out (np.ndarray, optional): where to write. Defaults to None (new
+                memory).
+            tmp (np.ndarray, optional): scratch space shaped like a_L.
+                Defaults to None.
+
+        Returns:
+            np.ndarray: (None, n_L)
+        """
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"{type(self).__name__}()"
+
+
+@register_loss("mse")
+class MSE(Loss):
+    """L = 1/2 |a_L - y|^2, as in Nielsen's book."""
+
+    def check(self, activation):
+        if not activation.elementwise:
+            raise ValueError(f"mse needs an element-wise output activation, not "
+                             f"{activation.name}")
+
+    def value(self, a_L, y, activation=None):
+        return 0.5 * float(np.sum(np.square(a_L - y)))
+
+    def delta(self, a_L, y, activation, out=None, tmp=None):
+        out = np.subtract(a_L, y, out=out)
+        out *= activation.derivative(a_L, out=tmp)
+        return out
+
+
+@register_loss("cross_entropy")
+class CrossEntropy(Loss):
+    """L = -sum y log a_L for softmax outputs, and the binary
+    -sum y log a_L + (1 - y) log(1 - a_L) for sigmoid outputs.
+    """
+    fused = True
+    eps = 1e-12
+
+    def check(self, activation):
+        if activation.name not in ("softmax", "sigmoid"):
+            raise ValueError(f"cross_entropy needs a softmax or sigmoid output, not "
+                             f"{activation.name}")
+
+    def value(self, a_L, y, activation=None):
+        a_L = np.clip(a_L, self.eps, 1 - self.eps)
+        if activation is not None and activation.name == "sigmoid":
+            return -float(np.sum(y * np.log(a_L) + (1 - y) * np.log(1 - a_L)))
+        return -float(np.sum(y * np.log(a_L)))
+
+    def delta(self, a_L, y, activation, out=None, tmp=None):
+        return np.subtract(a_L, y, out=out)
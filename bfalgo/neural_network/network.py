@@ -1,6 +1,16 @@
 """Adapted from Nielsen - 2006 - Neural Networks and Deep Learning, with array
 shape following TensorFlow's convention (None, n_layer_out)
 """
+import copy
+import json
+import os
+import time
+
+from bfalgo.neural_network.activations import get_activation
+from bfalgo.neural_network.callbacks import Evaluator
+from bfalgo.neural_network.loader import BatchLoader
+from bfalgo.neural_network.losses import get_loss
+from bfalgo.neural_network.optimizers import SGD, get_optimizer
 from bfalgo.utils.mnist_loader import load_data, vectorized_result
 import numpy as np
 
@@ -10,22 +20,19 @@ def nl_func(z, kind="sigmoid"):
 
     Args:
         z (float):
-        kind (str, optional): Nonlinear function type. Defaults to 'sigmoid'.
+        kind (str, optional): Nonlinear function type, a name registered in
+            activations.py. Defaults to 'sigmoid'.
 
     Returns:
         float:
     """
-    if kind == "sigmoid":
-        return 1.0 / (1 + np.exp(-z))
-    elif kind == "linear":
-        return z
-    elif kind == "tanh":
-        return np.tanh(z)
+    return get_activation(kind).forward(z)
 
 
 def da_dz(a):
     """da/dz for sigmoid function. a(z) is an element-wise mapping;
-    so is the multiplicaton.
+    so is the multiplicaton. Other activations supply their own, see
+    Activation.derivative().
 
     Args:
         a (float):
@@ -36,17 +43,123 @@ def da_dz(a):
     return a * (1 - a)
 
 
+def param_shapes(sizes):
+    """Shapes of the weights, then the biases, of a network of sizes."""
+    return [(sizes[isz], sizes[isz + 1]) for isz in range(len(sizes) - 1)] + [
+        (1, sz) for sz in sizes[1:]
+    ]
+
+
+def param_views(buf, sizes):
+    """Weights and biases as views into the flat array buf.
+
+    Returns:
+        weights (np.ndarray[]):
+        biases (np.ndarray[]):
+    """
+    views = []
+    offset = 0
+    for shape in param_shapes(sizes):
+        n = shape[0] * shape[1]
+        views.append(buf[offset : offset + n].reshape(shape))
+        offset += n
+    nlayer = len(sizes) - 1
+    return views[:nlayer], views[nlayer:]
+
+
+class Workspace:
+    """Every array touched by a training step on batches of batch_size
+    samples, allocated once. Index l follows layer_outs: x is layer 0, and
+    layer_outs[l], deltas[l] and tmp[l] are (batch_size, sizes[l]) for l>=1.
+    """
+
+    def __init__(self, sizes, batch_size, dtype=np.float64):
+        def empty(*shape):
+            return np.empty(shape, dtype=dtype)
+
+        self.batch_size = batch_size
+        self.x = empty(batch_size, sizes[0])
+        self.y = empty(batch_size, sizes[-1])
+        self.layer_outs = [self.x] + [empty(batch_size, sz) for sz in sizes[1:]]
+        self.deltas = [None] + [empty(batch_size, sz) for sz in sizes[1:]]
+        self.tmp = [None] + [empty(batch_size, sz) for sz in sizes[1:]]
+        self.nabla_w = [empty(sizes[isz], sizes[isz + 1]) for isz in range(len(sizes) - 1)]
+        self.nabla_b = [empty(1, sz) for sz in sizes[1:]]
+
+
+# Phases of SGD() timed in Network.phase_times; "evaluation" covers the
+# callbacks.
+PHASES = ("shuffle", "gather", "forward", "backprop", "update", "evaluation")
+_MAGIC = b"BFALGONN"
+_ALIGN = 64  # the parameter buffer starts at a multiple of this offset
+
+
 class Network:
-    def __init__(self, sizes, nl_kind="sigmoid"):
+    def __init__(self, sizes, nl_kind="sigmoid", dtype=np.float64, master_dtype=None,
+                 output_kind=None, loss="mse", optimizer=None, weights=None,
+                 biases=None):
+        """
+        Args:
+            sizes (int[]): number of neurons of each layer, input first
+            nl_kind (str | Activation, optional): Nonlinear function type of
+                the hidden layers, see activations.py. Defaults to 'sigmoid'.
+            dtype (np.dtype, optional): dtype of the forward, backprop and
+                evaluation compute. Defaults to np.float64.
+            master_dtype (np.dtype, optional): if set (e.g. np.float64 with
+                dtype=np.float32), updates accumulate into master copies of
+                the parameters in this dtype, and weights/biases are cast
+                from them after every step. Defaults to None.
+            output_kind (str | Activation, optional): Nonlinear function type
+                of the last layer. Defaults to nl_kind.
+            loss (str | Loss, optional): see losses.py, e.g. 'cross_entropy'
+                with output_kind='softmax'. Defaults to 'mse'.
+            optimizer (str | Optimizer, optional): see optimizers.py, e.g.
+                'adam'. Defaults to None, plain SGD with step size self.eta.
+            weights (np.ndarray[], optional): initial weights, used as they
+                are if already of dtype. Defaults to None (random).
+            biases (np.ndarray[], optional): initial biases. Defaults to None
+                (random).
+
+        Raises:
+            ValueError: for an unknown activation, loss or optimizer, a hidden
+                activation without an element-wise derivative, or a loss that
+                does not fit the output activation
+        """
         self.epochs = 10
         self.batch_size = 50
         self.eta = 5.0
         self.sizes = sizes
         self.nl_kind = nl_kind
-        self.weights = [
-            np.random.randn(sizes[isz], sizes[isz + 1]) for isz in range(len(sizes) - 1)
-        ]
-        self.biases = [np.random.randn(1, sz) for sz in sizes[1:]]
+        self.activation = get_activation(nl_kind)
+        self.output_activation = get_activation(
+            nl_kind if output_kind is None else output_kind
+        )
+        if len(sizes) > 2 and not self.activation.elementwise:
+            raise ValueError(f"{self.activation.name} has no element-wise "
+                             f"derivative and cannot be a hidden activation")
+        self.loss = get_loss(loss)
+        self.loss.check(self.output_activation)
+        self.optimizer = None if optimizer is None else get_optimizer(optimizer)
+        # Train through preallocated Workspace's, updating parameters in place.
+        self.in_place = False
+        self._workspaces = {}
+        self.phase_times = dict.fromkeys(PHASES, 0.0)
+        self.samples_seen = 0
+        self.dtype = np.dtype(dtype)
+        if weights is None:
+            weights = [
+                np.random.randn(sizes[isz], sizes[isz + 1])
+                for isz in range(len(sizes) - 1)
+            ]
+        if biases is None:
+            biases = [np.random.randn(1, sz) for sz in sizes[1:]]
+        if master_dtype is None or np.dtype(master_dtype) == self.dtype:
+            self.master_weights = self.master_biases = None
+        else:
+            self.master_weights = [w.astype(master_dtype) for w in weights]
+            self.master_biases = [b.astype(master_dtype) for b in biases]
+        self.weights = [np.asarray(w, dtype=self.dtype) for w in weights]
+        self.biases = [np.asarray(b, dtype=self.dtype) for b in biases]
 
     def forward(self, a):
         """Forward pass. Record a for each layer. Note that
@@ -58,127 +171,392 @@ class Network:
         Returns:
             layer_outs (np.ndarray[]): #layer of outputs
         """
-        a = a.reshape(-1, 784)
+        a = np.asarray(a, dtype=self.dtype).reshape(-1, self.sizes[0])
         layer_outs = [a]
         for layer in range(1, len(self.sizes)):
             z = np.dot(a, self.weights[layer - 1]) + self.biases[layer - 1]
-            a = nl_func(z, kind=self.nl_kind)
+            a = self._activation(layer).forward_inplace(z)
             layer_outs.append(a)
         return layer_outs
 
-    def backprop(self, x, y):
+    def _activation(self, layer):
+        if layer == len(self.sizes) - 1:
+            return self.output_activation
+        return self.activation
+
+    def backprop(self, x, y, layer_outs=None):
         """Get derivatives for each layer's weight and bias. Most vector
         differentiation analysis happens here.
 
+        The whole batch goes through each layer at once: delta_l is a
+        (batch, n_l) matrix, and the batch sum of the per-sample gradients
+        comes out of a single matmul per layer.
+
         Note that Layer-l corresponds to layer_outs[l], weights[l-1],
         and biases[l-1] (l>=1).
 
         Args:
-            x (np.ndarray): (784, )
-            y (np.ndarray): (10, )
+            x (np.ndarray): (None, 784), or a single sample (784, )
+            y (np.ndarray): (None, 10), or a single label (10, )
+            layer_outs (np.ndarray[], optional): forward(x), if already
+                computed. Defaults to None.
 
         Returns:
-            nabla_w (np.ndarray[]): weight matrices for each layer
-            nabla_b (np.ndarray[]): biases for each layer
+            nabla_w (np.ndarray[]): weight gradients for each layer, summed
+                over the batch
+            nabla_b (np.ndarray[]): bias gradients for each layer, summed over
+                the batch
         """
-        layer_outs = self.forward(x)
+        if layer_outs is None:
+            layer_outs = self.forward(x)
 
         a_L = layer_outs[-1]
-        delta_L = self.loss_prime(a_L, y) * da_dz(a_L).T  # (n_L, 1)
+        y = np.asarray(y, dtype=self.dtype).reshape(a_L.shape)
+        delta_L = self.loss.delta(a_L, y, self.output_activation)  # (None, n_L)
 
-        nabla_b = [delta_L.T]  # (1, n_L)
-        nabla_w = [np.dot(layer_outs[-2].T, delta_L.T)]  # (n_L-1, n_L)
+        nabla_b = [delta_L.sum(axis=0, keepdims=True)]  # (1, n_L)
+        nabla_w = [np.dot(layer_outs[-2].T, delta_L)]  # (n_L-1, n_L)
 
         delta_next_layer = delta_L
         for layer in range(len(self.sizes) - 2, 0, -1):
             delta_l = (
-                np.dot(self.weights[layer], delta_next_layer) * da_dz(layer_outs[layer]).T
-            )
+                np.dot(delta_next_layer, self.weights[layer].T)
+                * self.activation.derivative(layer_outs[layer])
+            )  # (None, n_l)
 
-            # Correction for Video: nabla_xx is the REAL nabla's transposed.
-            nabla_b.insert(0, delta_l.T)
-            nabla_w.insert(0, np.dot(layer_outs[layer - 1].T, delta_l.T))
+            nabla_b.insert(0, delta_l.sum(axis=0, keepdims=True))
+            nabla_w.insert(0, np.dot(layer_outs[layer - 1].T, delta_l))
 
             delta_next_layer = delta_l
 
         return nabla_w, nabla_b
 
-    def loss_prime(self, a_L, y):
-        """First derivative of loss.
+    def workspace(self, batch_size):
+        """The Workspace for batches of batch_size samples, created on first
+        use.
+        """
+        ws = self._workspaces.get(batch_size)
+        if ws is None:
+            ws = Workspace(self.sizes, batch_size, self.dtype)
+            self._workspaces[batch_size] = ws
+        return ws
+
+    def forward_into(self, ws, x=None):
+        """forward() of x, writing every layer's output into ws.
+
+        Args:
+            ws (Workspace):
+            x (np.ndarray, optional): (ws.batch_size, 784) input, e.g. a batch
+                from a BatchLoader. Defaults to None, ws.x.
+
+        Returns:
+            layer_outs (np.ndarray[]): ws.layer_outs
+        """
+        layer_outs = ws.layer_outs
+        layer_outs[0] = ws.x if x is None else x
+        for layer in range(1, len(self.sizes)):
+            z = layer_outs[layer]
+            np.matmul(layer_outs[layer - 1], self.weights[layer - 1], out=z)
+            z += self.biases[layer - 1]
+            self._activation(layer).forward_inplace(z)
+        return layer_outs
+
+    def backprop_into(self, ws, forward=True, x=None, y=None):
+        """backprop() of (x, y) without allocating: activations, deltas and
+        gradients all live in ws.
 
         Args:
-            a_L (np.ndarray): output of the last layer
-            y (np.ndarray): label
+            ws (Workspace):
+            forward (bool, optional): run forward_into(ws, x) first; False if
+                it already ran. Defaults to True.
+            x (np.ndarray, optional): Defaults to None, ws.x.
+            y (np.ndarray, optional): Defaults to None, ws.y.
 
         Returns:
-            []: [description]
+            nabla_w (np.ndarray[]): ws.nabla_w
+            nabla_b (np.ndarray[]): ws.nabla_b
         """
-        return (a_L - y).T
+        layer_outs = self.forward_into(ws, x) if forward else ws.layer_outs
+        y = ws.y if y is None else y
+        deltas, tmp = ws.deltas, ws.tmp
+
+        L = len(self.sizes) - 1
+        # A fused loss writes delta_L over the output it came from.
+        out = layer_outs[L] if self.loss.fused else deltas[L]
+        delta = self.loss.delta(layer_outs[L], y, self.output_activation, out, tmp[L])
+        np.matmul(layer_outs[L - 1].T, delta, out=ws.nabla_w[L - 1])
+        np.sum(delta, axis=0, keepdims=True, out=ws.nabla_b[L - 1])
+        for layer in range(L - 1, 0, -1):
+            np.matmul(delta, self.weights[layer].T, out=deltas[layer])
+            delta = deltas[layer]
+            delta *= self.activation.derivative(layer_outs[layer], tmp[layer])
+            np.matmul(layer_outs[layer - 1].T, delta, out=ws.nabla_w[layer - 1])
+            np.sum(delta, axis=0, keepdims=True, out=ws.nabla_b[layer - 1])
+        return ws.nabla_w, ws.nabla_b
+
+    def update(self, nabla_w, nabla_b, batch_size):
+        """Gradient step, rebuilding the weight and bias lists. With an
+        optimizer, same as update_inplace().
+        """
+        if self.optimizer is not None:
+            return self.update_inplace(nabla_w, nabla_b, batch_size)
+        scale = self.eta / batch_size
+        if self.master_weights is None:
+            self.weights = [w - scale * nbw for (w, nbw) in zip(self.weights, nabla_w)]
+            self.biases = [b - scale * nbb for (b, nbb) in zip(self.biases, nabla_b)]
+        else:
+            self.master_weights = [
+                w - scale * nbw for (w, nbw) in zip(self.master_weights, nabla_w)
+            ]
+            self.master_biases = [
+                b - scale * nbb for (b, nbb) in zip(self.master_biases, nabla_b)
+            ]
+            self.weights = [w.astype(self.dtype) for w in self.master_weights]
+            self.biases = [b.astype(self.dtype) for b in self.master_biases]
 
-    def SGD(self, X, y, test_X, test_y):
+    def update_inplace(self, nabla_w, nabla_b, batch_size):
+        """Optimizer step on the existing weight and bias arrays. nabla_w and
+        nabla_b are overwritten.
+        """
+        optimizer = self.optimizer if self.optimizer is not None else SGD(self.eta)
+        if self.master_weights is None:
+            params = self.weights + self.biases
+        else:
+            params = self.master_weights + self.master_biases
+        optimizer.step(params, nabla_w + nabla_b, 1.0 / batch_size)
+        if self.master_weights is not None:
+            for p, master in zip(self.weights + self.biases,
+                                 self.master_weights + self.master_biases):
+                np.copyto(p, master, casting="same_kind")
+
+    def SGD(self, X, y, test_X=None, test_y=None, callbacks=None, loader=None):
         """Train with small batches. Get smoothed(averaged) nabla_w & nabla_b,
         then update weights and biases, by training with mini-batches.
 
         Args:
             X (np.ndarray): (None, 784)
             y (np.ndarray): (None, 10)
-            test_X (np.ndarray):
-            test_y (np.ndarray):
+            test_X (np.ndarray, optional):
+            test_y (np.ndarray, optional):
+            callbacks (Callback[], optional): see callbacks.py. Defaults to
+                an Evaluator of the training and test data every 50 batches.
+            loader (BatchLoader, optional): where batches come from, e.g. to
+                prefetch them, seed the shuffling or keep the last partial
+                batch. Defaults to a BatchLoader over X and y of
+                self.batch_size that drops the partial batch.
         """
+        if callbacks is None:
+            datasets = {"Training": (X, y)}
+            if test_X is not None:
+                datasets["Test"] = (test_X, test_y)
+            callbacks = [Evaluator(datasets, every=50)]
+        if loader is None:
+            loader = BatchLoader(X, y, self.batch_size, drop_last=True, dtype=self.dtype)
+
+        # Wall time of each phase of training so far, see profiling.py.
+        times = self.phase_times = dict.fromkeys(PHASES, 0.0)
+        self.samples_seen = 0
+        clock = time.perf_counter
+
+        for cb in callbacks:
+            cb.on_train_begin(self)
         for i in range(self.epochs):
-            idx_shuffle = np.random.shuffle(np.arange(len(X)))
-            batch_size = self.batch_size
-            idx_batches = [
-                idx_shuffle[i * batch_size : (i + 1) * batch_size]
-                for i in range(len(X) // batch_size)
-            ]
+            for cb in callbacks:
+                cb.on_epoch_begin(self, i)
+            t0 = clock()
+            batches = iter(loader)
+            times["shuffle"] += clock() - t0
+
+            for idx in range(len(loader)):
+                t0 = clock()
+                x_batch, y_batch = next(batches)
+                n = len(x_batch)
+                t1 = clock()
+                if self.in_place:
+                    ws = self.workspace(n)
+                    self.forward_into(ws, x_batch)
+                    t2 = clock()
+                    nabla_w, nabla_b = self.backprop_into(ws, forward=False, y=y_batch)
+                    t3 = clock()
+                    self.update_inplace(nabla_w, nabla_b, n)
+                else:
+                    layer_outs = self.forward(x_batch)
+                    t2 = clock()
+                    nabla_w, nabla_b = self.backprop(x_batch, y_batch, layer_outs)
+                    t3 = clock()
+                    self.update(nabla_w, nabla_b, n)
+                t4 = clock()
+                self.samples_seen += n
+
+                for cb in callbacks:
+                    cb.on_batch_end(self, i, idx)
+                t5 = clock()
+                times["gather"] += t1 - t0
+                times["forward"] += t2 - t1
+                times["backprop"] += t3 - t2
+                times["update"] += t4 - t3
+                times["evaluation"] += t5 - t4
+            batches.close()
+            t0 = clock()
+            for cb in callbacks:
+                cb.on_epoch_end(self, i)
+            times["evaluation"] += clock() - t0
+        for cb in callbacks:
+            cb.on_train_end(self)
+
+    def snapshot(self):
+        """A copy of the network whose parameters are independent of this
+        one's, e.g. to evaluate while training goes on.
+
+        Returns:
+            Network:
+        """
+        net = copy.copy(self)
+        net.weights = [w.copy() for w in self.weights]
+        net.biases = [b.copy() for b in self.biases]
+        net.master_weights = net.master_biases = None
+        net._workspaces = {}
+        return net
+
+    def save(self, path):
+        """Write a checkpoint: a small JSON header describing the network,
+        then all weights and biases as one contiguous little-endian buffer,
+        aligned so that load() can memory-map it. The file is replaced
+        atomically, so processes loading it never see a partial write.
+
+        Args:
+            path (str):
+        """
+        dtype = self.dtype.newbyteorder("<")
+        header = {
+            "sizes": list(self.sizes),
+            "nl_kind": self.activation.name,
+            "output_kind": self.output_activation.name,
+            "loss": self.loss.name,
+            "dtype": dtype.str,
+        }
+        header = json.dumps(header).encode()
+        offset = len(_MAGIC) + 4 + len(header)
+        header += b" " * (-offset % _ALIGN)
+
+        tmp = f"{path}.tmp{os.getpid()}"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(_MAGIC)
+                f.write(len(header).to_bytes(4, "little"))
+                f.write(header)
+                for p in self.weights + self.biases:
+                    f.write(np.ascontiguousarray(p, dtype=dtype).data)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Network from a checkpoint written by save().
+
+        Args:
+            path (str):
+            mmap (bool, optional): map the parameters copy-on-write from the
+                file instead of reading them, so that processes loading the
+                same checkpoint share its pages and loading costs next to
+                nothing. Training copies the pages it writes to and never
+                modifies the file. Defaults to True.
+
+        Raises:
+            ValueError: if path is not a checkpoint
+
+        Returns:
+            Network:
+        """
+        with open(path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"{path} is not a Network checkpoint")
+            n = int.from_bytes(f.read(4), "little")
+            header = json.loads(f.read(n))
+            offset = f.tell()
+        sizes = header["sizes"]
+        dtype = np.dtype(header["dtype"])
+        nparams = sum(r * c for r, c in param_shapes(sizes))
+        if mmap:
+            buf = np.memmap(path, dtype=dtype, mode="c", offset=offset, shape=(nparams,))
+        else:
+            buf = np.fromfile(path, dtype=dtype, count=nparams, offset=offset)
+        weights, biases = param_views(buf, sizes)
+        return cls(
+            sizes, header["nl_kind"], dtype=dtype.newbyteorder("="),
+            output_kind=header["output_kind"], loss=header["loss"],
+            weights=weights, biases=biases,
+        )
+
+    def predict_chunks(self, X, batch_size=1024):
+        """Forward pass over X in chunks of batch_size rows, through buffers
+        allocated once per call. Only the last layer's output is kept, so
+        memory stays bounded however many rows X has (e.g. an np.memmap).
+
+        Args:
+            X (np.ndarray): (None, 784)
+            batch_size (int, optional): Defaults to 1024.
+
+        Yields:
+            start (int): index of the chunk's first row in X
+            out (np.ndarray): (n, n_L) output of the chunk; overwritten by the
+                next chunk
+        """
+        batch_size = max(1, min(batch_size, len(X)))
+        inp = np.empty((batch_size, self.sizes[0]), dtype=self.dtype)
+        bufs = [np.empty((batch_size, sz), dtype=self.dtype) for sz in self.sizes[1:]]
+        for start in range(0, len(X), batch_size):
+            n = min(batch_size, len(X) - start)
+            a = inp[:n]
+            a[...] = X[start : start + n].reshape(-1, self.sizes[0])
+            for layer in range(1, len(self.sizes)):
+                z = bufs[layer - 1][:n]
+                np.matmul(a, self.weights[layer - 1], out=z)
+                z += self.biases[layer - 1]
+                a = self._activation(layer).forward_inplace(z)
+            yield start, a
+
+    def predict(self, X, batch_size=1024):
+        """Output of the last layer for every row of X, computed in chunks.
+
+        Args:
+            X (np.ndarray): (None, 784)
+            batch_size (int, optional): Defaults to 1024.
+
+        Returns:
+            np.ndarray: (None, n_L)
+        """
+        y_calc = np.empty((len(X), self.sizes[-1]), dtype=self.dtype)
+        for start, out in self.predict_chunks(X, batch_size):
+            y_calc[start : start + len(out)] = out
+        return y_calc
 
-            for idx, idx_batch in enumerate(idx_batches):
-                nabla_w = [
-                    np.zeros((self.sizes[i], self.sizes[i + 1]))
-                    for i in range(len(self.sizes) - 1)
-                ]
-                nabla_b = [
-                    np.zeros((1, self.sizes[i])) for i in range(1, len(self.sizes))
-                ]
-
-                for one_x, one_y in zip(X[idx_batch], y[idx_batch]):
-                    nb_w, nb_b = self.backprop(one_x, one_y)
-                    nabla_w = [
-                        nw + self.eta / batch_size * nbw
-                        for (nw, nbw) in zip(nabla_w, nb_w)
-                    ]
-                    nabla_b = [
-                        nb + self.eta / batch_size * nbb
-                        for (nb, nbb) in zip(nabla_b, nb_b)
-                    ]
-
-                self.weights = [w - nbw for (w, nbw) in zip(self.weights, nabla_w)]
-                self.biases = [b - nbb for (b, nbb) in zip(self.biases, nabla_b)]
-
-                if idx % 50 == 0:
-                    print(
-                        f"Now the {idx}(/{len(X)//batch_size})th batch "
-                        + f"of epoch {i+1}(/{self.epochs})."
-                    )
-                    self.evaluate(X, y, "Training")
-                    self.evaluate(test_X, test_y, "Test")
-
-    def evaluate(self, X, y, label):
-        """Evaluate model by accuracy.
+    def evaluate(self, X, y, label=None, batch_size=1024):
+        """Evaluate model by accuracy, chunk by chunk.
 
         Args:
             X (np.ndarray): dim(size, 784)
-            y (np.ndarray): dim(size, 10)
-            label (string):
+            y (np.ndarray): dim(size, 10) one-hot, or dim(size, ) class labels
+            label (string, optional): if given, print the accuracy to console
+                under it. Defaults to None.
+            batch_size (int, optional): Defaults to 1024.
 
         Returns:
-            None (print to console)
+            float: accuracy
         """
-        layer_outs = self.forward(X)
-        y_calc = layer_outs[-1]
-        correct = [np.argmax(y_calc[i]) == np.argmax(y[i]) for i in range(len(X))]
-        print(f"{label} data: accuracy {sum(correct)/len(X):.3f}.")
+        correct = 0
+        for start, out in self.predict_chunks(X, batch_size):
+            y_true = y[start : start + len(out)]
+            if y_true.ndim > 1:
+                y_true = np.argmax(y_true, axis=1)
+            correct += np.count_nonzero(np.argmax(out, axis=1) == y_true)
+        accuracy = float(correct / len(X)) if len(X) else 0.0
+        if label is not None:
+            print(f"{label} data: accuracy {accuracy:.3f}.")
+        return accuracy
 
 
 if __name__ == "__main__":
@@ -0,0 +1,131 @@
+"""Optimizers, looked up by name in a registry.
+
+An optimizer updates the parameters in place from the batch-summed
+gradients that backprop produces; scale (1/batch_size) turns those into
+means. Per-parameter state (velocities, moment estimates) is allocated on
+the first step, shaped like the parameters, and updated in place after.
+
+    sgd        p -= eta g
+    momentum   v = mu v + g;  p -= eta v
+    adam       m = b1 m + (1 - b1) g;  v = b2 v + (1 - b2) g^2;
+               p -= eta m^ / (sqrt(v^) + eps), with bias-corrected m^, v^
+
+New optimizers register with @register_optimizer("name").
+
+Ref:
+1. Kingma, Ba, "Adam: A Method for Stochastic Optimization"
+"""
+import numpy as np
+
+
+OPTIMIZERS = {}
+
+
+def register_optimizer(name):
+    """Class decorator adding an Optimizer to OPTIMIZERS under name."""
+
+    def register(cls):
+        cls.name = name
+        OPTIMIZERS[name] = cls
+        return cls
+
+    return register
+
+
+def get_optimizer(kind, **kwargs):
+    """An Optimizer instance from a name and its hyperparameters, or kind
+    itself if it is one.
+
+    Raises:
+        ValueError: if the name is not registered
+    """
+    if isinstance(kind, Optimizer):
+        return kind
+    if kind not in OPTIMIZERS:
+        raise ValueError(f"Unknown optimizer {kind}")
+    return OPTIMIZERS[kind](**kwargs)
+
+
+class Optimizer:
+    name = None
+
+    def __init__(self, eta):
+        self.eta = eta
+        self.state = None
+
+    def step(self, params, grads, scale=1.0):
+        """Update params in place.
+
+        Args:
+            params (np.ndarray[]): weights and biases
+            grads (np.ndarray[]): gradients, in the order of params; may be
+                overwritten
+            scale (float, optional): factor of the gradients, e.g.
+                1/batch_size. Defaults to 1.0.
+        """
+        raise NotImplementedError
+
+    def _zeros(self, params, n):
+        """n zero buffers per parameter, allocated on the first call."""
+        if self.state is None:
+            self.state = [[np.zeros_like(p) for p in params] for _ in range(n)]
+        return self.state
+
+    def __repr__(self):
+        return f"{type(self).__name__}(eta={self.eta})"
+
+
+@register_optimizer("sgd")
+class SGD(Optimizer):
+    def __init__(self, eta=5.0):
+        super().__init__(eta)
+
+    def step(self, params, grads, scale=1.0):
+        for p, g in zip(params, grads):
+            g *= self.eta * scale
+            p -= g
+
+
+@register_optimizer("momentum")
+class Momentum(Optimizer):
+    def __init__(self, eta=0.5, mu=0.9):
+        super().__init__(eta)
+        self.mu = mu
+
+    def step(self, params, grads, scale=1.0):
+        (velocities,) = self._zeros(params, 1)
+        for p, g, v in zip(params, grads, velocities):
+            v *= self.mu
+            g *= scale
+            v += g
+            g[...] = v
+            g *= self.eta
+            p -= g
+
+
+@register_optimizer("adam")
+class Adam(Optimizer):
+    def __init__(self, eta=0.001, beta1=0.9, beta2=0.999, eps=1e-8):
+        super().__init__(eta)
+        self.beta1 = beta1
+        self.beta2 = beta2
+        self.eps = eps
+        self.t = 0
+
+    def step(self, params, grads, scale=1.0):
+        ms, vs = self._zeros(params, 2)
+        self.t += 1
+        # Bias corrections folded into the step size.
+        eta = self.eta * np.sqrt(1 - self.beta2 ** self.t) / (1 - self.beta1 ** self.t)
+        for p, g, m, v in zip(params, grads, ms, vs):
+            g *= scale
+            m *= self.beta1
+            m += (1 - self.beta1) * g
+            np.square(g, out=g)
+            v *= self.beta2
+            v += (1 - self.beta2) * g
+            np.sqrt(v, out=g)
+            g += self.eps
+            np.divide(m, g, out=g)
+            g *= eta
+            p -= g
@@ -0,0 +1,248 @@
+"""Data-parallel training of a Network on worker processes.
+
+The parameters, the training data and one gradient slot per worker live in
+multiprocessing.shared_memory blocks, so nothing but a batch number crosses
+a process boundary during training:
+
+    sync     for every batch, each worker computes the gradient of its shard
+             of the batch into its slot; the parent sums the slots and updates
+             the shared parameters. Same updates as Network.SGD().
+    hogwild  each worker runs SGD over its shard of every epoch, updating the
+             shared parameters in place without locks (Niu et al., 2011).
+
+Workers and parent take turns through a Barrier. Each worker runs its own
+BLAS, so with n_workers close to the number of cores, limit BLAS to one
+thread (e.g. OMP_NUM_THREADS=1).
+
+    >>> parallel_SGD(network, X, y, test_X, test_y, n_workers=8)
+
+Ref:
+1. Niu, Recht, Re, Wright, "Hogwild!: A Lock-Free Approach to Parallelizing
+   Stochastic Gradient Descent"
+"""
+import multiprocessing as mp
+import os
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from bfalgo.neural_network.callbacks import Evaluator
+from bfalgo.neural_network.loader import gather
+from bfalgo.neural_network.network import PHASES, param_shapes, param_views
+
+
+def _create(shape, dtype):
+    dtype = np.dtype(dtype)
+    nbytes = max(1, int(np.prod(shape)) * dtype.itemsize)
+    shm = shared_memory.SharedMemory(create=True, size=nbytes)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _attach(name, shape, dtype):
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _worker_loop(rank, n_workers, net, arrays, barrier, hogwild):
+    ctrl, perm = arrays["ctrl"], arrays["perm"]
+    X, y = arrays["X"], arrays["y"]
+    net.weights, net.biases = param_views(arrays["params"], net.sizes)
+    grad_w, grad_b = param_views(arrays["grads"][rank], net.sizes)
+
+    while True:
+        barrier.wait()
+        if ctrl[0] < 0:
+            return
+        if hogwild:
+            # Own shard of the epoch, in mini-batches, straight into the
+            # shared parameters.
+            shard = np.array_split(perm, n_workers)[rank]
+            for start in range(0, len(shard) - net.batch_size + 1, net.batch_size):
+                idx = shard[start : start + net.batch_size]
+                ws = net.workspace(len(idx))
+                gather(X, idx, ws.x)
+                gather(y, idx, ws.y)
+                net.update_inplace(*net.backprop_into(ws), len(idx))
+        else:
+            batch = perm[ctrl[0] * net.batch_size : (ctrl[0] + 1) * net.batch_size]
+            idx = np.array_split(batch, n_workers)[rank]
+            if len(idx) == 0:
+                for g in grad_w + grad_b:
+                    g[...] = 0
+            else:
+                ws = net.workspace(len(idx))
+                gather(X, idx, ws.x)
+                gather(y, idx, ws.y)
+                nabla_w, nabla_b = net.backprop_into(ws)
+                for g, nabla in zip(grad_w + grad_b, nabla_w + nabla_b):
+                    g[...] = nabla
+        barrier.wait()
+
+
+def _worker(rank, n_workers, net, blocks, barrier, hogwild):
+    """Worker process: wait for a command, run it, report back. ctrl[0] < 0
+    means stop.
+    """
+    shms = []
+    arrays = {}
+    try:
+        for key, (name, shape, dtype) in blocks.items():
+            shm, arrays[key] = _attach(name, shape, dtype)
+            shms.append(shm)
+        _worker_loop(rank, n_workers, net, arrays, barrier, hogwild)
+    except BaseException:
+        # Wake the parent and the other workers up instead of leaving them
+        # waiting forever.
+        barrier.abort()
+        raise
+    finally:
+        # The views must go before their buffers can be closed.
+        arrays.clear()
+        net.weights = net.biases = None
+        for shm in shms:
+            shm.close()
+
+
+def _train(net, X, y, callbacks, n_workers, hogwild, arrays, blocks):
+    nparams = len(arrays["params"])
+    grads, ctrl = arrays["grads"], arrays["ctrl"]
+    total = np.empty(nparams, dtype=net.dtype)
+    nabla_w, nabla_b = param_views(total, net.sizes)
+
+    barrier = mp.Barrier(n_workers + 1)
+    # Workers get parameter-less copies of the network, and their own
+    # views of the shared parameters.
+    template = net.snapshot()
+    template.weights = template.biases = None
+    procs = [
+        mp.Process(
+            target=_worker, args=(rank, n_workers, template, blocks, barrier, hogwild),
+            daemon=True,
+        )
+        for rank in range(n_workers)
+    ]
+    for proc in procs:
+        proc.start()
+    try:
+        n_batches = len(X) // net.batch_size
+        if hogwild:
+            # Each worker drops the partial batch at the end of its shard.
+            shards = np.array_split(np.arange(len(X)), n_workers)
+            step_samples = sum(len(s) // net.batch_size for s in shards) * net.batch_size
+        else:
+            step_samples = net.batch_size
+        # The workers' forward and backprop passes count as "backprop".
+        times = net.phase_times = dict.fromkeys(PHASES, 0.0)
+        net.samples_seen = 0
+        clock = time.perf_counter
+        for cb in callbacks:
+            cb.on_train_begin(net)
+        for i in range(net.epochs):
+            for cb in callbacks:
+                cb.on_epoch_begin(net, i)
+            t0 = clock()
+            arrays["perm"][...] = np.random.permutation(len(X))
+            times["shuffle"] += clock() - t0
+            for idx in range(1 if hogwild else n_batches):
+                t0 = clock()
+                ctrl[0] = idx
+                barrier.wait()  # workers start
+                barrier.wait()  # workers are done
+                t1 = clock()
+                if not hogwild:
+                    np.sum(grads, axis=0, out=total)
+                    net.update_inplace(nabla_w, nabla_b, net.batch_size)
+                t2 = clock()
+                net.samples_seen += step_samples
+                for cb in callbacks:
+                    cb.on_batch_end(net, i, idx)
+                times["backprop"] += t1 - t0
+                times["update"] += t2 - t1
+                times["evaluation"] += clock() - t2
+            t0 = clock()
+            for cb in callbacks:
+                cb.on_epoch_end(net, i)
+            times["evaluation"] += clock() - t0
+        for cb in callbacks:
+            cb.on_train_end(net)
+
+        ctrl[0] = -1
+        barrier.wait()
+    except BaseException:
+        barrier.abort()
+        raise
+    finally:
+        for proc in procs:
+            proc.join(timeout=10)
+            if proc.is_alive():
+                proc.terminate()
+
+
+def parallel_SGD(net, X, y, test_X=None, test_y=None, callbacks=None,
+                 n_workers=None, hogwild=False):
+    """Network.SGD() on n_workers processes.
+
+    Args:
+        net (Network): trained in place
+        X (np.ndarray): (None, 784)
+        y (np.ndarray): (None, 10)
+        test_X (np.ndarray, optional):
+        test_y (np.ndarray, optional):
+        callbacks (Callback[], optional): as in Network.SGD(). With hogwild,
+            the parent sees one step per epoch, so on_batch_end() is called
+            once per epoch, with batch 0.
+        n_workers (int, optional): Defaults to os.cpu_count().
+        hogwild (bool, optional): lock-free asynchronous updates instead of
+            synchronous gradient reduction. Defaults to False.
+    """
+    n_workers = n_workers or os.cpu_count()
+    if callbacks is None:
+        datasets = {"Training": (X, y)}
+        if test_X is not None:
+            datasets["Test"] = (test_X, test_y)
+        callbacks = [Evaluator(datasets, every=50)]
+
+    dtype = net.dtype
+    nparams = sum(r * c for r, c in param_shapes(net.sizes))
+    specs = {
+        "ctrl": ((1,), np.int64),
+        "perm": ((len(X),), np.int64),
+        "X": ((len(X), net.sizes[0]), dtype),
+        "y": ((len(X), net.sizes[-1]), dtype),
+        "params": ((nparams,), dtype),
+        "grads": ((n_workers, nparams), dtype),
+    }
+    shms = []
+    arrays = {}
+    blocks = {}
+    weights, biases = net.weights, net.biases
+    try:
+        for key, (shape, dt) in specs.items():
+            shm, arrays[key] = _create(shape, dt)
+            shms.append(shm)
+            blocks[key] = (shm.name, shape, np.dtype(dt).str)
+        arrays["X"][...] = X
+        arrays["y"][...] = y
+        # From here on, the parent's parameters are the shared ones.
+        net.weights, net.biases = param_views(arrays["params"], net.sizes)
+        for p, src in zip(net.weights + net.biases, weights + biases):
+            p[...] = src
+        _train(net, X, y, callbacks, n_workers, hogwild, arrays, blocks)
+    finally:
+        # Copy the parameters out before the shared memory goes away.
+        if net.weights is not weights:
+            net.weights = [w.copy() for w in net.weights]
+            net.biases = [b.copy() for b in net.biases]
+        arrays.clear()
+        for shm in shms:
+            shm.close()
+            shm.unlink()
+    if hogwild and net.master_weights is not None:
+        # Workers updated the compute copies directly.
+        net.master_weights = [
+            w.astype(m.dtype) for w, m in zip(net.weights, net.master_weights)
+        ]
+        net.master_biases = [
+            b.astype(m.dtype) for b, m in zip(net.biases, net.master_biases)
+        ]
@@ -0,0 +1,117 @@
+"""Training throughput metrics and profiling.
+
+Network.SGD() keeps the wall time of each phase of training in
+net.phase_times (see PHASES; "evaluation" is the time spent in callbacks),
+and the number of training samples processed in net.samples_seen. Metrics is
+a callback turning those into one record per epoch:
+
+    >>> metrics = Metrics(on_metrics=print, trace_memory=True)
+    >>> network.SGD(X, y, callbacks=[metrics, evaluator])
+    {'epoch': 0, 'seconds': 2.1, 'samples': 50000, 'samples_per_sec': 23809.5,
+     'phases': {'shuffle': 0.002, 'gather': 0.09, ...}, 'peak_rss': 201326592,
+     'peak_traced': 1843200}
+
+profile_SGD() runs a whole training under cProfile for a function-level
+view of the hot loop.
+"""
+import cProfile
+import pstats
+import sys
+import time
+import tracemalloc
+
+from bfalgo.neural_network.callbacks import Callback
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes, None if unknown."""
+    if resource is None:
+        return None
+    # ru_maxrss is in bytes on macOS, in kilobytes elsewhere.
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+class Metrics(Callback):
+    def __init__(self, on_metrics=None, trace_memory=False, verbose=False):
+        """
+        Args:
+            on_metrics (callable, optional): called with the record of every
+                epoch. Defaults to None.
+            trace_memory (bool, optional): track the peak of Python and NumPy
+                allocations with tracemalloc, which slows allocations down.
+                Defaults to False.
+            verbose (bool, optional): print a summary of every epoch. Defaults
+                to False.
+        """
+        self.on_metrics = on_metrics
+        self.trace_memory = trace_memory
+        self.verbose = verbose
+        self.history = []
+        self._started_tracing = False
+
+    def on_train_begin(self, net):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def on_epoch_begin(self, net, epoch):
+        self._t0 = time.perf_counter()
+        self._samples0 = net.samples_seen
+        self._phases0 = dict(net.phase_times)
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+
+    def on_epoch_end(self, net, epoch):
+        seconds = time.perf_counter() - self._t0
+        samples = net.samples_seen - self._samples0
+        record = {
+            "epoch": epoch,
+            "seconds": seconds,
+            "samples": samples,
+            "samples_per_sec": samples / seconds if seconds > 0 else None,
+            "phases": {
+                phase: t - self._phases0.get(phase, 0.0)
+                for phase, t in net.phase_times.items()
+            },
+            "peak_rss": peak_rss(),
+        }
+        if self.trace_memory:
+            record["peak_traced"] = tracemalloc.get_traced_memory()[1]
+        self.history.append(record)
+        if self.verbose:
+            phases = ", ".join(f"{k} {v:.3f}s" for k, v in record["phases"].items())
+            print(f"Epoch {epoch + 1}: {seconds:.3f}s, "
+                  f"{record['samples_per_sec'] or 0:.0f} samples/s ({phases}).")
+        if self.on_metrics is not None:
+            self.on_metrics(record)
+
+    def on_train_end(self, net):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+
+def profile_SGD(net, *args, output=None, sort="cumulative", **kwargs):
+    """Run net.SGD(*args, **kwargs) under cProfile.
+
+    Args:
+        net (Network):
+        output (str, optional): also dump the raw profile there, for
+            snakeviz, gprof2dot etc. Defaults to None.
+        sort (str, optional): sort key of the returned stats. Defaults to
+            'cumulative'.
+
+    Returns:
+        pstats.Stats: e.g. .print_stats(20)
+    """
+    profiler = cProfile.Profile()
+    profiler.runcall(net.SGD, *args, **kwargs)
+    if output is not None:
+        profiler.dump_stats(output)
+    return pstats.Stats(profiler).sort_stats(sort)
@@ -0,0 +1,230 @@
+"""Benchmark of the regex engines, written to JSON so that runs of different
+versions can be compared.
+
+    $ python -m bfalgo.regex.benchmark --out bench.json
+    $ python -m bfalgo.regex.benchmark --quick --baseline bench.json
+
+Workloads:
+    compile        Pattern construction (cold) and compile() cache hits
+    pathological   a?^n a^n against a^n, and nested stars (x+x+)+y against
+                   x^n zy, which are exponential for a backtracking matcher
+    log            unanchored search over a generated log corpus
+    multi          many patterns over the same corpus, one PatternSet pass
+                   against one search per pattern
+
+Each measurement is the best of `repeat` runs, so the lazy DFA caches are
+warm, reported in seconds and, where it consumes input, in MB/s. Python's
+backtracking re is timed alongside as a reference, and skipped where it would
+take exponential time.
+
+With --baseline, entries that got slower than the baseline by more than
+--threshold are listed, and the exit status is 1 if there are any.
+"""
+import argparse
+import json
+import platform
+import random
+import re
+import sys
+import time
+
+from bfalgo.regex.pattern import Pattern, compile
+from bfalgo.regex.pattern_set import PatternSet
+
+
+ENGINES = ("dfa", "pike", "flat", "nfa")
+RE_LIMIT = 20  # largest n for which re runs the pathological patterns
+
+LOG_PATTERNS = [
+    "ERROR",
+    "ERROR.*timeout",
+    "user=\\w+",
+    "took \\d\\d\\d+ms",
+    "(GET|POST) /api/v\\d/(items|users)/\\d+",
+    "\\d+\\.\\d+\\.\\d+\\.\\d+",
+    "(a|b|c|d|e)+zz",
+    "worker-(1|7) .*(WARN|ERROR)",
+]
+_LEVELS = ["INFO"] * 8 + ["DEBUG"] * 4 + ["WARN"] * 2 + ["ERROR"]
+_PATHS = ["/api/v1/items", "/api/v2/users", "/static/app.js", "/health"]
+_MESSAGES = [
+    "request done", "cache miss", "retrying", "connection timeout",
+    "payload too large", "user session started",
+]
+
+
+def pathological(n: int) -> 'list[tuple[str, str, str]]':
+    """(name, regex, text) of the pathological cases of size n."""
+    return [
+        (f"a?^{n}a^{n}", "a?" * n + "a" * n, "a" * n),
+        (f"(x+x+)+y/{n}", "(x+x+)+y", "x" * n + "zy"),
+    ]
+
+
+def log_corpus(nlines: int, seed: int = 0) -> 'list[bytes]':
+    """Deterministic lines in the style of a web server log."""
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(nlines):
+        line = "2024-05-%02d %02d:%02d:%02d %s worker-%d %s %s/%d from %d.%d.%d.%d " \
+               "user=%s took %dms %s" % (
+                   rng.randint(1, 28), rng.randint(0, 23), rng.randint(0, 59),
+                   rng.randint(0, 59), rng.choice(_LEVELS), rng.randint(0, 9),
+                   rng.choice(["GET", "POST"]), rng.choice(_PATHS),
+                   rng.randint(1, 9999), rng.randint(1, 255), rng.randint(0, 255),
+                   rng.randint(0, 255), rng.randint(1, 254),
+                   "".join(rng.choice("abcdefgh") for _ in range(rng.randint(3, 8))),
+                   int(rng.expovariate(1 / 80)), rng.choice(_MESSAGES),
+               )
+        lines.append(line.encode())
+    return lines
+
+
+def best_of(fn, repeat: int) -> float:
+    """Smallest wall time of repeat calls of fn, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def _record(results: list, workload: str, name: str, engine: str, seconds: float,
+            nbytes: int = 0):
+    results.append({
+        "workload": workload,
+        "name": name,
+        "engine": engine,
+        "seconds": seconds,
+        "bytes": nbytes,
+        "mb_per_s": nbytes / seconds / 1e6 if nbytes and seconds > 0 else None,
+    })
+
+
+def bench_compile(results: list, repeat: int):
+    for reg in LOG_PATTERNS:
+        _record(results, "compile", reg, "cold", best_of(lambda: Pattern(reg), repeat))
+        compile(reg)
+        _record(results, "compile", reg, "cached", best_of(lambda: compile(reg), repeat))
+
+
+def bench_pathological(results: list, sizes, repeat: int):
+    for n in sizes:
+        for name, reg, text in pathological(n):
+            p = Pattern(reg)
+            data = text.encode()
+            for engine in ENGINES:
+                _record(results, "pathological", name, engine,
+                        best_of(lambda: p.match(data, engine=engine), repeat), len(data))
+            if n <= RE_LIMIT:
+                r = re.compile(reg)
+                _record(results, "pathological", name, "re",
+                        best_of(lambda: r.fullmatch(text), repeat), len(data))
+
+
+def bench_log(results: list, lines: 'list[bytes]', repeat: int):
+    nbytes = sum(len(line) for line in lines)
+    for reg in LOG_PATTERNS:
+        p = Pattern(reg)
+        sdfa = p.search_dfa
+        r = re.compile(reg.encode())
+        runs = {
+            "dfa": lambda: [sdfa.match(line) for line in lines],
+            "pike": lambda: [p.search(line) for line in lines],
+            "re": lambda: [r.search(line) for line in lines],
+        }
+        for engine, fn in runs.items():
+            _record(results, "log", reg, engine, best_of(fn, repeat), nbytes)
+
+
+def bench_multi(results: list, lines: 'list[bytes]', repeat: int):
+    nbytes = sum(len(line) for line in lines)
+    name = f"{len(LOG_PATTERNS)} patterns"
+    ps = PatternSet(LOG_PATTERNS, anchored=False)
+    dfas = [Pattern(reg).search_dfa for reg in LOG_PATTERNS]
+    runs = {
+        "set-dfa": lambda: [ps.match(line) for line in lines],
+        "set-nfa": lambda: [ps.match(line, engine="nfa") for line in lines],
+        "each-dfa": lambda: [[d.match(line) for d in dfas] for line in lines],
+    }
+    for engine, fn in runs.items():
+        _record(results, "multi", name, engine, best_of(fn, repeat), nbytes)
+
+
+def run(quick: bool = False, repeat: int = None) -> dict:
+    """Run all workloads.
+
+    Args:
+        quick (bool, optional): small sizes, for a smoke test. Defaults to False.
+        repeat (int, optional): runs per measurement. Defaults to 1 if quick,
+            else 5.
+
+    Returns:
+        dict: {"meta": {...}, "results": [...]}, see _record() for the fields
+    """
+    if repeat is None:
+        repeat = 1 if quick else 5
+    sizes = (8, 16) if quick else (10, 20, 50, 100)
+    lines = log_corpus(50 if quick else 5000)
+
+    results = []
+    bench_compile(results, repeat)
+    bench_pathological(results, sizes, repeat)
+    bench_log(results, lines, repeat)
+    bench_multi(results, lines[:20] if quick else lines[:1000], repeat)
+    meta = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "quick": quick,
+        "repeat": repeat,
+    }
+    return {"meta": meta, "results": results}
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.2) -> 'list[str]':
+    """Entries of current that are slower than in baseline by more than
+    threshold (a fraction of the baseline time).
+    """
+    key = lambda r: (r["workload"], r["name"], r["engine"], r["bytes"])
+    old = {key(r): r["seconds"] for r in baseline["results"]}
+    slower = []
+    for r in current["results"]:
+        t = old.get(key(r))
+        if t and r["seconds"] > t * (1 + threshold):
+            slower.append(f"{r['workload']:<13}{r['name']:<45}{r['engine']:<9}"
+                          f"{t:.6f}s -> {r['seconds']:.6f}s")
+    return slower
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", help="write the results to this JSON file")
+    parser.add_argument("--quick", action="store_true", help="small sizes")
+    parser.add_argument("--repeat", type=int, help="runs per measurement")
+    parser.add_argument("--baseline", help="JSON file of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="tolerated slowdown, as a fraction. Defaults to 0.2")
+    args = parser.parse_args(argv)
+
+    report = run(args.quick, args.repeat)
+    for r in report["results"]:
+        rate = "" if r["mb_per_s"] is None else f"{r['mb_per_s']:10.2f} MB/s"
+        print(f"{r['workload']:<13}{r['name']:<45}{r['engine']:<9}{r['seconds']:.6f}s{rate}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = compare(json.load(f), report, args.threshold)
+        if slower:
+            print(f"\n{len(slower)} regression(s) against {args.baseline}:")
+            print("\n".join(slower))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+"""Character classes, escapes and byte-class tables.
+
+Supported syntax:
+    .          any byte but newline
+    [abc]      one of a, b, c
+    [a-z0-9]   ranges
+    [^...]     negated class
+    \\d \\w \\s  digit, word, and space bytes; \\D \\W \\S are their complements
+    \\n \\t \\r \\f \\v \\xHH
+    \\c         c itself for any other c, eg. \\. \\* \\( \\[ \\\\
+
+Classes and escapes survive into the postfix string as written, so
+regex_to_postfix() still returns a str, eg. [a-c]+x -> [a-c]+x. ; only `.`
+is rewritten, to [^\\n], because `.` is the concatenation operator in postfix.
+A class is compiled to a 256-entry membership table (bytes of 0/1), which a
+CLASS state tests with a single index.
+
+byte_classes() computes the alphabet compression used by the lazy DFA: bytes
+that no state of the NFA can tell apart form one class, so a DFA state keeps
+one transition per class instead of one per byte.
+"""
+
+
+ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'f': '\f', 'v': '\v'}
+
+
+def _table(chars: str) -> bytes:
+    table = bytearray(256)
+    for c in chars:
+        table[ord(c)] = 1
+    return bytes(table)
+
+
+def _negate(table: bytes) -> bytes:
+    return bytes(1 - v for v in table)
+
+
+_DIGIT = _table('0123456789')
+_WORD = _table('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_')
+_SPACE = _table(' \t\n\r\f\v')
+CLASS_ESCAPES = {
+    'd': _DIGIT, 'D': _negate(_DIGIT),
+    'w': _WORD, 'W': _negate(_WORD),
+    's': _SPACE, 'S': _negate(_SPACE),
+}
+
+
+def _escape_end(s: str, i: int) -> int:
+    """End of the escape starting with the backslash at s[i]."""
+    if i + 1 >= len(s):
+        raise ValueError("Trailing backslash")
+    if s[i + 1] == 'x':
+        if len(s[i + 2:i + 4]) != 2 or not all(c in '0123456789abcdefABCDEF' for c in s[i + 2:i + 4]):
+            raise ValueError(f"Bad escape {s[i:i + 4]}")
+        return i + 4
+    return i + 2
+
+
+def _class_end(s: str, i: int) -> int:
+    """End of the bracket expression starting with the '[' at s[i]."""
+    j = i + 1
+    if s[j:j + 1] == '^':
+        j += 1
+    if s[j:j + 1] == ']':
+        # A leading ] is a literal.
+        j += 1
+    while j < len(s):
+        if s[j] == '\\':
+            j = _escape_end(s, j)
+        elif s[j] == ']':
+            return j + 1
+        else:
+            j += 1
+    raise ValueError(f"Unterminated class {s[i:]}")
+
+
+def _escape(tok: str) -> 'int | bytes':
+    """A single byte, or the table of a class escape."""
+    c = tok[1]
+    if c in CLASS_ESCAPES:
+        return CLASS_ESCAPES[c]
+    if c == 'x':
+        return int(tok[2:], 16)
+    c = ESCAPES.get(c, c)
+    if ord(c) > 127:
+        raise ValueError(f"Non-ASCII escape {tok}")
+    return ord(c)
+
+
+def parse_class(tok: str) -> bytes:
+    """Membership table of a bracket expression such as [^a-z_]."""
+    body = tok[1:-1]
+    negate = body.startswith('^')
+    if negate:
+        body = body[1:]
+
+    # Split into items: a single byte (int) or a table (bytes).
+    items = []
+    j = 0
+    while j < len(body):
+        if body[j] == '\\':
+            end = _escape_end(body, j)
+            items.append(_escape(body[j:end]))
+            j = end
+        else:
+            if ord(body[j]) > 127:
+                raise ValueError(f"Non-ASCII character in class {tok}")
+            items.append(body[j] if body[j] == '-' else ord(body[j]))
+            j += 1
+
+    table = bytearray(256)
+    k = 0
+    while k < len(items):
+        item = items[k]
+        if k + 2 < len(items) and items[k + 1] == '-':
+            lo, hi = item, items[k + 2]
+            lo = ord(lo) if lo == '-' else lo
+            hi = ord(hi) if hi == '-' else hi
+            if not isinstance(lo, int) or not isinstance(hi, int) or lo > hi:
+                raise ValueError(f"Bad range in {tok}")
+            for b in range(lo, hi + 1):
+                table[b] = 1
+            k += 3
+            continue
+        if item == '-':
+            table[ord('-')] = 1
+        elif isinstance(item, int):
+            table[item] = 1
+        else:
+            for b in range(256):
+                table[b] |= item[b]
+        k += 1
+    return _negate(table) if negate else bytes(table)
+
+
+def parse_atom(tok: str) -> 'list[int | bytes]':
+    """Bytes matched in sequence by an operand token: an int for a literal
+    byte, a table for a class. A non-ASCII literal gives its UTF-8 bytes.
+    """
+    if tok[0] == '[':
+        return [parse_class(tok)]
+    if tok[0] == '\\':
+        return [_escape(tok)]
+    return list(tok.encode())
+
+
+def regex_tokens(re: str):
+    """Split a regex into operators (single characters among ()|*+?) and
+    operand tokens, written the way they appear in postfix.
+
+    Raises:
+        ValueError: on a malformed escape or class
+    """
+    i = 0
+    while i < len(re):
+        c = re[i]
+        if c == '\\':
+            end = _escape_end(re, i)
+            tok = re[i:end]
+            parse_atom(tok)
+            yield tok
+            i = end
+        elif c == '[':
+            end = _class_end(re, i)
+            tok = re[i:end]
+            parse_atom(tok)
+            yield tok
+            i = end
+        elif c == '.':
+            yield '[^\\n]'
+            i += 1
+        elif c == ']':
+            yield '\\]'
+            i += 1
+        else:
+            yield c
+            i += 1
+
+
+def postfix_tokens(postfix: str):
+    """Split a postfix string into operators (single characters among
+    .|*+?) ) and operand tokens.
+    """
+    i = 0
+    while i < len(postfix):
+        c = postfix[i]
+        if c == '\\':
+            end = _escape_end(postfix, i)
+        elif c == '[':
+            end = _class_end(postfix, i)
+        else:
+            end = i + 1
+        yield postfix[i:end]
+        i = end
+
+
+def byte_classes(literals, tables) -> 'tuple[bytes, list[int]]':
+    """Partition the 256 byte values into classes that the given literal
+    bytes and class tables cannot tell apart.
+
+    Args:
+        literals (iterable[int]): bytes matched by literal states
+        tables (iterable[bytes]): membership tables of class states
+
+    Returns:
+        bytes: bytemap, bytemap[b] is the class of byte b; usable with
+            bytes.translate()
+        list[int]: a representative byte of each class
+    """
+    literals = set(literals)
+    tables = list(tables)
+    ids = {}
+    bytemap = bytearray(256)
+    reps = []
+    for b in range(256):
+        key = (b if b in literals else -1,) + tuple(t[b] for t in tables)
+        if key not in ids:
+            ids[key] = len(reps)
+            reps.append(b)
+        bytemap[b] = ids[key]
+    return bytes(bytemap), reps
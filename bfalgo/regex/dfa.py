@@ -0,0 +1,178 @@
+"""Lazy DFA on top of the Thompson NFA in nfa.py.
+
+Instead of converting the whole NFA into a DFA up front (which can take
+exponential space), deterministic states are built on demand while matching:
+each DFA state stands for a set of NFA states, and the transition on a byte is
+computed the first time it is needed and memoized. Matching then costs one
+list lookup per input byte once the cache is warm.
+
+Transitions are kept per byte class rather than per byte (see
+charclass.byte_classes()): the input is first mapped to class ids with
+bytes.translate(), which runs in C, so a state only needs as many
+transitions as the pattern has distinguishable bytes.
+
+Unanchored DFAs (anchored=False) answer "does some substring match": the NFA
+start state is added to every DFA state, and MATCHED states stick once
+reached. A DFA state records the ids of the patterns matched so far (see
+PatternSet), and whether the outcome is decided, so the scan can stop early.
+
+The cache is bounded as in RE2: when the estimated memory of the cached states
+exceeds `max_mem`, the whole cache is flushed and rebuilt from the state the
+matcher is currently in.
+
+Ref:
+1. Russ Cox, "Regular Expression Matching in the Wild"
+   (https://swtch.com/~rsc/regexp/regexp3.html)
+"""
+import sys
+
+from bfalgo.regex.nfa import MATCHED, CLASS, State
+from bfalgo.regex.flat import FlatNFA
+from bfalgo.regex.charclass import byte_classes
+
+
+class DState:
+    """A DFA state: a set of (non-split) NFA state ids and its memoized
+    transitions. next[c] is None until the transition on byte class c is
+    computed.
+    matches holds the ids of the matched patterns; decided tells that no
+    further input can change the outcome.
+    """
+    __slots__ = ("nstates", "matches", "is_match", "decided", "next")
+
+    def __init__(self, nstates: 'tuple[int]', matches: frozenset, decided: bool,
+                 nclasses: int = 256):
+        self.nstates = nstates
+        self.matches = matches
+        self.is_match = bool(matches)
+        self.decided = decided
+        self.next = [None] * nclasses
+
+    def __repr__(self):
+        return f"DState({list(self.nstates)}, {sorted(self.matches)})"
+
+
+class DFA:
+    def __init__(self, nfa: 'FlatNFA | State', max_mem: int = 1 << 20,
+                 anchored: bool = True):
+        """
+        Args:
+            nfa (FlatNFA | State): the NFA, or its start state as returned by
+                postfix_to_nfa()
+            max_mem (int, optional): memory budget (bytes) of the state cache.
+                Defaults to 1MB.
+            anchored (bool, optional): match the whole string (True), or
+                any substring (False). Defaults to True.
+        """
+        if isinstance(nfa, State):
+            nfa = FlatNFA.from_nfa(nfa)
+        self.nfa = nfa
+        self.anchored = anchored
+        self.match_ids = frozenset(
+            nfa.out1[pc] for pc in range(len(nfa)) if nfa.op[pc] == MATCHED
+        )
+        self.bytemap, self.reps = byte_classes(
+            (v for v in nfa.op if v < 256), nfa.classes
+        )
+        self.nclasses = len(self.reps)
+        self.max_mem = max_mem
+        self.mem = 0
+        self.cache = {}
+        self.cache_resets = 0
+        self._start = None
+        # The dead state has no NFA states left; it loops on itself and is
+        # never flushed.
+        self.dead = DState((), frozenset(), True, self.nclasses)
+        self.dead.next = [self.dead] * self.nclasses
+
+    def _state_cost(self, nstates: 'tuple[int]') -> int:
+        return 2 * sys.getsizeof(self.dead.next) + 8 * len(nstates)
+
+    def reset_cache(self):
+        """Drop every cached state. States still referenced by a running
+        match stay valid, they are just not reachable from the cache anymore.
+        """
+        self.cache = {}
+        self.mem = 0
+        self._start = None
+        self.cache_resets += 1
+
+    def cached_state(self, pcs: 'list[int]') -> DState:
+        """Look up (or build) the DFA state for the closure of NFA states pcs."""
+        nstates = tuple(self.nfa.closure(pcs))
+        if not nstates:
+            return self.dead
+        key = frozenset(nstates)
+        d = self.cache.get(key)
+        if d is None:
+            cost = self._state_cost(nstates)
+            if self.mem + cost > self.max_mem:
+                self.reset_cache()
+            op, out1 = self.nfa.op, self.nfa.out1
+            matches = frozenset(out1[pc] for pc in nstates if op[pc] == MATCHED)
+            decided = not self.anchored and matches == self.match_ids
+            d = DState(nstates, matches, decided, self.nclasses)
+            self.cache[key] = d
+            self.mem += cost
+        return d
+
+    def start_state(self) -> DState:
+        if self._start is None:
+            self._start = self.cached_state([self.nfa.start])
+        return self._start
+
+    def transition(self, d: DState, c: int) -> DState:
+        """Compute and memoize the transition of d on byte class c."""
+        op, out, out1, classes = self.nfa.op, self.nfa.out, self.nfa.out1, self.nfa.classes
+        b = self.reps[c]
+        pcs = [
+            out[pc] for pc in d.nstates
+            if op[pc] == b or (op[pc] == CLASS and classes[out1[pc]][b])
+        ]
+        if not self.anchored:
+            pcs.extend(pc for pc in d.nstates if op[pc] == MATCHED)
+            pcs.append(self.nfa.start)
+        nd = self.cached_state(pcs)
+        d.next[c] = nd
+        return nd
+
+    def translate(self, string) -> bytes:
+        """Map the bytes of string to byte class ids."""
+        if not isinstance(string, (bytes, bytearray)):
+            string = bytes(string)
+        return string.translate(self.bytemap)
+
+    def run(self, string: 'str | bytes') -> DState:
+        """Run the DFA over string, stopping once the outcome is decided.
+
+        Args:
+            string (str | bytes): str is encoded as UTF-8
+
+        Returns:
+            DState: the last state reached
+        """
+        if isinstance(string, str):
+            string = string.encode()
+        d = self.start_state()
+        if d.decided:
+            return d
+        for c in self.translate(string):
+            nd = d.next[c]
+            if nd is None:
+                nd = self.transition(d, c)
+            if nd.decided:
+                return nd
+            d = nd
+        return d
+
+    def match(self, string: 'str | bytes') -> bool:
+        """Whole-string match (same semantics as nfa.match()), or substring
+        match for an unanchored DFA.
+
+        Args:
+            string (str | bytes): str is encoded as UTF-8
+
+        Returns:
+            bool:
+        """
+        return self.run(string).is_match
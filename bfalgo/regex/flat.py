@@ -0,0 +1,130 @@
+"""Array-backed ("flat") form of the Thompson NFA.
+
+The linked State objects of nfa.py are laid out as three parallel integer
+arrays indexed by state id:
+
+    op[i]     the state's value: a byte (<256), SPLIT, MATCHED, SAVE or CLASS
+    out[i]    state id of out, -1 for None
+    out1[i]   state id of out1, -1 for None; the capture slot for SAVE, the
+              pattern id for MATCHED, and the index in `classes` of the
+              membership table for CLASS
+
+which takes a few bytes per state instead of a Python object per state, and
+lets simulation work on plain ints. Every traversal below uses an explicit
+worklist, so deeply nested patterns such as (((a*)*)*)... don't run into the
+recursion limit.
+"""
+from array import array
+
+from bfalgo.regex.nfa import SPLIT, MATCHED, SAVE, CLASS, State
+
+
+def _flatten(states: 'list[State]', start: State, index) -> 'FlatNFA':
+    """Flatten states, where index(s) is the new id of state s."""
+    classes = {}  # table -> index, shared by equal classes
+    op = array('i', [s.value for s in states])
+    out = array('i', [-1 if s.out is None else index(s.out) for s in states])
+    out1 = array('i')
+    for s in states:
+        if s.value == SAVE:
+            out1.append(s.slot)
+        elif s.value == MATCHED:
+            out1.append(s.match_id)
+        elif s.value == CLASS:
+            out1.append(classes.setdefault(s.table, len(classes)))
+        else:
+            out1.append(-1 if s.out1 is None else index(s.out1))
+    return FlatNFA(op, out, out1, index(start), tuple(classes))
+
+
+class FlatNFA:
+    __slots__ = ("op", "out", "out1", "start", "classes", "nslots")
+
+    def __init__(self, op: array, out: array, out1: array, start: int,
+                 classes: 'tuple[bytes]' = ()):
+        self.op = op
+        self.out = out
+        self.out1 = out1
+        self.start = start
+        self.classes = classes
+        # Slots 0 and 1 hold the span of the whole match.
+        self.nslots = 2 + sum(1 for v in op if v == SAVE)
+
+    def __len__(self):
+        return len(self.op)
+
+    @classmethod
+    def from_states(cls, states: 'list[State]', start: State) -> 'FlatNFA':
+        """Flatten states numbered 0..len(states)-1, as collected by
+        postfix_to_nfa(postfix, states).
+        """
+        return _flatten(states, start, lambda t: t.state_id)
+
+    @classmethod
+    def from_nfa(cls, start: State) -> 'FlatNFA':
+        """Flatten the NFA reachable from start, renumbering its states."""
+        index = {id(start): 0}
+        states = [start]
+        i = 0
+        while i < len(states):
+            s = states[i]
+            for t in (s.out, s.out1):
+                if t is not None and id(t) not in index:
+                    index[id(t)] = len(states)
+                    states.append(t)
+            i += 1
+
+        return _flatten(states, start, lambda t: index[id(t)])
+
+    def closure(self, pcs: 'list[int]') -> 'list[int]':
+        """Follow SPLIT and SAVE arrows from the states pcs.
+
+        Args:
+            pcs (list[int]): state ids
+
+        Returns:
+            list[int]: reachable non-split state ids, each at most once
+        """
+        op, out, out1 = self.op, self.out, self.out1
+        seen = set()
+        result = []
+        stack = list(reversed(pcs))
+        while stack:
+            pc = stack.pop()
+            if pc < 0 or pc in seen:
+                continue
+            seen.add(pc)
+            if op[pc] == SPLIT:
+                stack.append(out1[pc])
+                stack.append(out[pc])
+            elif op[pc] == SAVE:
+                stack.append(out[pc])
+            else:
+                result.append(pc)
+        return result
+
+    def step(self, clist: 'list[int]', b: int) -> 'list[int]':
+        op, out, out1, classes = self.op, self.out, self.out1, self.classes
+        return self.closure([
+            out[pc] for pc in clist
+            if op[pc] == b or (op[pc] == CLASS and classes[out1[pc]][b])
+        ])
+
+    def match(self, string: 'str | bytes') -> bool:
+        """Anchored whole-string match, same semantics as nfa.match().
+
+        Args:
+            string (str | bytes): str is encoded as UTF-8
+
+        Returns:
+            bool:
+        """
+        if isinstance(string, str):
+            string = string.encode()
+        clist = self.closure([self.start])
+        for b in string:
+            clist = self.step(clist, b)
+            if not clist:
+                return False
+        op = self.op
+        return any(op[pc] == MATCHED for pc in clist)
@@ -1,6 +1,8 @@
 import sys
 
-def regex_to_postfix(re: str) -> str:
+from bfalgo.regex.charclass import regex_tokens, postfix_tokens, parse_atom
+
+def regex_to_postfix(re: str, captures: bool = False) -> str:
     """Convert RegExp to postfix expressions. Eg.
         eg.1: (ab)?ba -> ab.?b.a.
         eg.2: a(bb)+a -> abb.+.a.
@@ -18,18 +20,31 @@ def regex_to_postfix(re: str) -> str:
     has the lowest precedence, we make sure characters on the two sides of |
     NOT concatenate by concatenate everything on the left ("clearance").
 
+    With captures=True, every group is closed by a unary ')' operator that
+    marks it as a capture group, eg. (ab)?ba -> ab.)?b.a.
+
+    Classes and escapes are operands, written to postfix as they are (see
+    charclass.py), eg. [a-c]+\\.x -> [a-c]+\\..x.
+
     Args:
         re (str): [description]
+        captures (bool, optional): emit ')' for capture groups. Defaults to
+            False.
 
     Returns:
         str: [description]
     """
+    try:
+        tokens = list(regex_tokens(re))
+    except ValueError:
+        return None
+
     dst = ''
     n_alt = 0
     n_atom = 0
     idx_p = 0
     p = []
-    for symbol in re:
+    for symbol in tokens:
         if symbol == '(':
             if n_atom > 1:
                 n_atom -= 1
@@ -51,6 +66,8 @@ def regex_to_postfix(re: str) -> str:
             while n_alt > 0:
                 n_alt -= 1
                 dst = dst + '|'
+            if captures:
+                dst = dst + ')'
             curr_paren = p.pop()
 
             # Restore the snapshot before entering on exiting.
@@ -80,6 +97,9 @@ def regex_to_postfix(re: str) -> str:
 
     if len(p) != 0:
         return None
+    # A trailing '|' has nothing on its right-hand side.
+    if n_alt > 0 and n_atom == 0:
+        return None
     while n_atom > 1:
         n_atom -= 1
         dst = dst + '.'
@@ -92,108 +112,183 @@ def regex_to_postfix(re: str) -> str:
 # for ascii characters
 SPLIT = 256  
 MATCHED = 257
-state_id = 0
+SAVE = 258
+CLASS = 259
 
 class State:
-    def __init__(self, value, out, out1):
+    def __init__(self, value, out, out1, state_id=0):
         """
         State is classified by value,
             value (int): 
                 <256 ('consume'), 
                 256 ('split'), 
                 257 ('stop' or 'matched') 
+                258 ('save', records the input position in capture slot
+                    `slot` and moves on to out without consuming)
+                259 ('class', consumes a byte b if table[b] is set)
         and has different out pointers:
             out (State): 
             out1 (State): 
+        state_id (int) numbers the state within its NFA.
         """
-        global state_id
         self.state_id = state_id
         self.value = value
         self.out = out  # a single state or None
         self.out1 = out1  # a single state or None
-        state_id += 1
-
-    def collect_state(s, layer, all_states):
-        # !!!Danger: mind the loops
-        if s.out is not None:
-            collect_state(s.out, layer+1)
-        if s.out1 is not None:
-            collect_state(s.out1, layer+1)
-        
+        self.slot = None  # capture slot of a SAVE state
+        self.match_id = 0  # pattern id of a MATCHED state
+        self.table = None  # 256-entry membership table of a CLASS state
+        self.lastlist = None  # id of the last list this state was added to
+
     def __repr__(self):
-        collect_state(self, 0)
+        return f"State({self.state_id}, {self.value})"
 
-    
 
 class Fragment:
     """An NFA is composed of Fragment's. Each fragment is a black box,
-    exposing to outside world with a start state and a list of connected
-    pointers, pointing to None or some state. 
+    exposing to outside world with a start state and a list of dangling
+    arrows. A dangling arrow is a (state, attr) pair, naming the out pointer
+    of `state` that is still None and waits to be patched.
     """
-    def __init__(self, start: State, out: 'list[State]'):
+    def __init__(self, start: State, out: 'list[tuple[State, str]]'):
         self.start = start
         self.out = out
 
 def patch(outlist, state):
-    """
+    """Connect every dangling arrow in outlist to state.
 
     Args:
-        outlist ([type]): [description]
-        state ([type]): [description]
+        outlist (list[tuple[State, str]]): dangling arrows
+        state (State): the state to point to
     """
-    outlist.pop()
-    outlist.append(state)
+    for s, attr in outlist:
+        setattr(s, attr, state)
     return outlist
 
-def join_outs(outlist1: 'list[State]', outlist2: 'list[State]'):
-    """The last element of outlist1 is always None
+def join_outs(outlist1: 'list[tuple[State, str]]',
+              outlist2: 'list[tuple[State, str]]'):
+    """Concatenate two lists of dangling arrows.
 
     Args:
-        outlist1 (List[State]): [description]
-        outlist2 (List[State]): [description]
+        outlist1 (list[tuple[State, str]]):
+        outlist2 (list[tuple[State, str]]):
     """
-    outlist1.pop()
-    return outlist1.extend(outlist2)
+    return outlist1 + outlist2
 
-def list1(state: State):
-    return [state] 
+def list1(state: State, attr: str = 'out'):
+    return [(state, attr)]
 
-def postfix_to_nfa(postfix):
+def new_state(states: 'list[State]', value, out, out1) -> State:
+    """Create a state numbered by its position in states."""
+    s = State(value, out, out1, len(states))
+    states.append(s)
+    return s
+
+def postfix_to_fragment(postfix, states: 'list[State]') -> Fragment:
+    """Build the fragment for a postfix expression (Thompson's construction).
+    Its dangling arrows are left for the caller to patch.
+
+    A ')' operator (see regex_to_postfix(captures=True)) wraps the fragment
+    between two SAVE states. Groups are numbered 1, 2, ... in the order of
+    their opening parentheses; group k saves to slots 2k and 2k+1.
+
+    Args:
+        postfix (str): output of regex_to_postfix()
+        states (list[State]): collects the created states
+
+    Returns:
+        Fragment: None for a malformed postfix
+    """
     nfa_nodes = []
-    for rc in postfix:
+    # Position in postfix of the first operand of each fragment on nfa_nodes;
+    # it orders groups the way their opening parentheses are ordered.
+    firsts = []
+    groups = []
+    for i, rc in enumerate(postfix_tokens(postfix)):
         if rc == '.':
             e2 = nfa_nodes.pop()
             e1 = nfa_nodes.pop()
             patch(e1.out, e2.start)
             nfa_nodes.append(Fragment(e1.start, e2.out))
+            firsts.pop()
         elif rc == '|':
             e2 = nfa_nodes.pop()
             e1 = nfa_nodes.pop()
-            s = State(SPLIT, e1.start, e2.start)
+            s = new_state(states, SPLIT, e1.start, e2.start)
             nfa_nodes.append(Fragment(s, join_outs(e1.out, e2.out)))
+            firsts.pop()
+        elif rc == ')':
+            e1 = nfa_nodes.pop()
+            s1 = new_state(states, SAVE, None, None)
+            patch(e1.out, s1)
+            s = new_state(states, SAVE, e1.start, None)
+            nfa_nodes.append(Fragment(s, list1(s1)))
+            # An enclosing group starting at the same operand closes later.
+            groups.append((firsts[-1], -i, s, s1))
         elif rc == '*':
             e1 = nfa_nodes.pop()
-            s = State(SPLIT, e1.start, None)
+            s = new_state(states, SPLIT, e1.start, None)
             patch(e1.out, s)
-            nfa_nodes.append(Fragment(s, list1(s.out1)))
+            nfa_nodes.append(Fragment(s, list1(s, 'out1')))
         elif rc == '?':
             e1 = nfa_nodes.pop()
-            s = State(SPLIT, e1.start, None)
-            nfa_nodes.append(Fragment(s, join_outs(e1.out, list1(s.out1))))
+            s = new_state(states, SPLIT, e1.start, None)
+            nfa_nodes.append(Fragment(s, join_outs(e1.out, list1(s, 'out1'))))
         elif rc == '+':
             e1 = nfa_nodes.pop()
-            s = State(SPLIT, e1.start, None)
+            s = new_state(states, SPLIT, e1.start, None)
             patch(e1.out, s)
-            nfa_nodes.append(Fragment(e1.start, list1(s.out1)))
+            nfa_nodes.append(Fragment(e1.start, list1(s, 'out1')))
         else:
-            s = State(rc, None, None)
-            nfa_nodes.append(Fragment(s, list1(s.out)))
-    
-    e = nfa_nodes.pop()
-    if len(nfa_nodes) != 0:
+            # An operand: usually one byte or class, several bytes for a
+            # non-ASCII character.
+            e = None
+            for item in parse_atom(rc):
+                if isinstance(item, int):
+                    s = new_state(states, item, None, None)
+                else:
+                    s = new_state(states, CLASS, None, None)
+                    s.table = item
+                if e is None:
+                    e = Fragment(s, list1(s))
+                else:
+                    patch(e.out, s)
+                    e = Fragment(e.start, list1(s))
+            nfa_nodes.append(e)
+            firsts.append(i)
+
+    if len(nfa_nodes) != 1:
+        return None
+    for k, (_, _, s, s1) in enumerate(sorted(groups, key=lambda g: g[:2]), 1):
+        s.slot = 2 * k
+        s1.slot = 2 * k + 1
+    return nfa_nodes.pop()
+
+def postfix_to_nfa(postfix, states=None, match_id=0):
+    """Build the NFA for a postfix expression (Thompson's construction).
+
+    States are numbered 0, 1, 2, ... in creation order, so ids stay small and
+    local to the NFA instead of growing with every compiled pattern.
+
+    Args:
+        postfix (str): output of regex_to_postfix()
+        states (list[State], optional): collects the created states. Pass the
+            same list to several calls to number their states jointly.
+        match_id (int, optional): tag of the MATCHED state, telling apart
+            the patterns of a pattern set. Defaults to 0.
+
+    Returns:
+        State: start state of the NFA, or None for a malformed postfix
+    """
+    if states is None:
+        states = []
+    e = postfix_to_fragment(postfix, states)
+    if e is None:
         return None
-    patch(e.out, State(MATCHED, None, None))
-    return e
+    s = new_state(states, MATCHED, None, None)
+    s.match_id = match_id
+    patch(e.out, s)
+    return e.start
 
 def ismatch(l: 'list[State]') -> bool:
     for s in l:
@@ -201,38 +296,64 @@ def ismatch(l: 'list[State]') -> bool:
             return 1
     return 0
 
-def addstate(state_list: 'list[State]', state: State):
+def addstate(state_list: 'list[State]', state: State, listid=None):
+    """Add state to state_list, following SPLIT and SAVE arrows.
+
+    As in Thompson's original, a state remembers the list it was last added
+    to (lastlist), so each state enters a list at most once. This bounds the
+    list by the number of states, and stops the recursion on empty loops
+    such as (a*)*.
+
+    Args:
+        state_list (list[State]):
+        state (State):
+        listid (object, optional): identifies state_list. Defaults to
+            state_list itself.
+    """
+    if listid is None:
+        listid = state_list
+    if state is None or state.lastlist is listid:
+        return
+    state.lastlist = listid
     if state.value == SPLIT:
-        addstate(state_list, state.out)
-        addstate(state_list, state.out1)
+        addstate(state_list, state.out, listid)
+        addstate(state_list, state.out1, listid)
         return    
+    elif state.value == SAVE:
+        addstate(state_list, state.out, listid)
     else:
         state_list.append(state)
 
 def step(current_states, c):
     next_states = []
     for s in current_states:
-        if s.value == c:
+        if s.value == c or (s.value == CLASS and s.table[c]):
             addstate(next_states, s.out) 
     return next_states 
 
-def match(start: State, string: str) -> bool:
-    clist = [start]
-    nlist = []
+def match(start: State, string: 'str | bytes') -> bool:
+    """Anchored whole-string match. The input is read as bytes: str is
+    encoded as UTF-8, bytes-like objects are used as they are.
+    """
+    if isinstance(string, str):
+        string = string.encode()
+    clist = []
+    addstate(clist, start)
     for c in string:
-        c = ord(c)
         clist = step(clist, c)
     return ismatch(clist)
 
 def main(reg, string):
-    postfix = regex_to_postfix(reg)
-    if postfix is None:
-        print(f"Bad regexp {reg}\n")
+    # Compiled patterns are cached, repeated calls skip the NFA construction.
+    from bfalgo.regex.pattern import compile
 
-    nfa = postfix_to_nfa(postfix)
-    print("ho")
+    try:
+        pattern = compile(reg)
+    except ValueError:
+        print(f"Bad regexp {reg}\n")
+        return 1
 
-    if match(nfa, string):
+    if pattern.match(string, engine="nfa"):
         print(f"{string} matched RegEx {reg}")
     return 0
 
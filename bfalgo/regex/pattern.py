@@ -0,0 +1,343 @@
+"""Compiled patterns and a module-level LRU cache of them.
+
+    >>> from bfalgo.regex.pattern import compile
+    >>> p = compile("a(b|c)*d")
+    >>> p.match("abcbd")
+    True
+
+Besides the whole-string match(), patterns support unanchored search(),
+finditer() and findall() with capture groups, run by the Pike VM. Before any
+automaton runs, a literal prefilter (see prefilter.py) rejects bytes inputs
+that lack the pattern's required literals.
+
+compile() pays for regex_to_postfix() and postfix_to_nfa() once per pattern
+string and keeps the NFA in its flat, array-backed form (see flat.py); the
+automata derived from it (e.g. the lazy DFA) are built on first use and kept
+on the Pattern, so their caches stay warm across calls.
+"""
+import collections
+import threading
+from typing import NamedTuple
+
+from bfalgo.regex import nfa
+from bfalgo.regex.dfa import DFA
+from bfalgo.regex.flat import FlatNFA
+from bfalgo.regex.pike import PikeVM
+from bfalgo.regex.prefilter import Prefilter
+from bfalgo.regex.stream import Matcher
+
+
+class Pattern:
+    """An immutable compiled regex. Use compile() rather than building one
+    directly, so that the instance is shared through the cache.
+    """
+    __slots__ = ("_pattern", "_postfix", "_flat", "_prefilter", "_nfa", "_states",
+                 "_dfa", "_sdfa")
+
+    def __init__(self, pattern: str):
+        postfix = nfa.regex_to_postfix(pattern, captures=True)
+        if postfix is None:
+            raise ValueError(f"Bad regexp {pattern}")
+        states = []
+        start = nfa.postfix_to_nfa(postfix, states)
+        if start is None:
+            raise ValueError(f"Bad regexp {pattern}")
+
+        set_ = object.__setattr__
+        set_(self, "_pattern", pattern)
+        set_(self, "_postfix", postfix)
+        set_(self, "_flat", FlatNFA.from_states(states, start))
+        set_(self, "_prefilter", Prefilter(postfix))
+        # The linked NFA is only rebuilt if someone asks for it.
+        set_(self, "_nfa", None)
+        set_(self, "_states", None)
+        set_(self, "_dfa", None)
+        set_(self, "_sdfa", None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __repr__(self):
+        return f"compile({self._pattern!r})"
+
+    @property
+    def pattern(self) -> str:
+        return self._pattern
+
+    @property
+    def postfix(self) -> str:
+        return self._postfix
+
+    @property
+    def groups(self) -> int:
+        """Number of capture groups."""
+        return (self._flat.nslots - 2) // 2
+
+    @property
+    def flat(self) -> FlatNFA:
+        return self._flat
+
+    @property
+    def prefilter(self) -> Prefilter:
+        return self._prefilter
+
+    @property
+    def nfa(self) -> nfa.State:
+        """Start state of the linked NFA, built on first access."""
+        if self._nfa is None:
+            states = []
+            start = nfa.postfix_to_nfa(self._postfix, states)
+            object.__setattr__(self, "_states", tuple(states))
+            object.__setattr__(self, "_nfa", start)
+        return self._nfa
+
+    @property
+    def states(self) -> 'tuple[nfa.State]':
+        """All states of the linked NFA, indexed by state_id."""
+        self.nfa
+        return self._states
+
+    @property
+    def dfa(self) -> DFA:
+        """The lazy DFA, created on first access."""
+        if self._dfa is None:
+            object.__setattr__(self, "_dfa", DFA(self._flat))
+        return self._dfa
+
+    @property
+    def search_dfa(self) -> DFA:
+        """The unanchored lazy DFA (does any substring match), created on
+        first access.
+        """
+        if self._sdfa is None:
+            object.__setattr__(self, "_sdfa", DFA(self._flat, anchored=False))
+        return self._sdfa
+
+    def matcher(self, anchored: bool = True) -> Matcher:
+        """A streaming Matcher, see stream.py.
+
+        Args:
+            anchored (bool, optional): whole-input (True) or substring (False)
+                match. Defaults to True.
+        """
+        return Matcher(self.dfa if anchored else self.search_dfa)
+
+    def _may_match(self, data, pos=0, endpos=None, anchored=False) -> bool:
+        # The prefilter needs bytes.find(); other buffers go straight to the
+        # automaton.
+        if not isinstance(data, (bytes, bytearray)):
+            return True
+        return self._prefilter.may_match(data, pos, endpos, anchored)
+
+    def _skip_prefix(self, data) -> bytes:
+        return self._prefilter.prefix if isinstance(data, (bytes, bytearray)) else b""
+
+    def match(self, string: 'str | bytes', engine: str = "dfa") -> bool:
+        """Anchored whole-string match.
+
+        Args:
+            string (str | bytes):
+            engine (str, optional): "dfa", "pike" (Pike VM), "flat" (NFA
+                simulation over the flat form) or "nfa" (the linked NFA).
+                Defaults to "dfa".
+
+        Returns:
+            bool:
+        """
+        if isinstance(string, str):
+            string = string.encode()
+        if not self._may_match(string, anchored=True):
+            return False
+        if engine == "dfa":
+            return self.dfa.match(string)
+        elif engine == "pike":
+            return PikeVM(self._flat).match(string)
+        elif engine == "flat":
+            return self._flat.match(string)
+        elif engine == "nfa":
+            return bool(nfa.match(self.nfa, string))
+        raise ValueError(f"Unknown engine {engine}")
+
+    def search(self, string: 'str | bytes', pos: int = 0, endpos: int = None) -> 'Match':
+        """Find the leftmost match anywhere in string[pos:endpos].
+
+        Args:
+            string (str | bytes): str is encoded as UTF-8, and positions are
+                offsets in the encoded bytes.
+            pos (int, optional): Defaults to 0.
+            endpos (int, optional): Defaults to the end of string.
+
+        Returns:
+            Match: None if there is no match
+        """
+        data = string.encode() if isinstance(string, str) else string
+        if not self._may_match(data, pos, endpos):
+            return None
+        regs = PikeVM(self._flat).search(data, pos, endpos, self._skip_prefix(data))
+        if regs is None:
+            return None
+        return Match(self, string, data, regs)
+
+    def finditer(self, string: 'str | bytes', pos: int = 0, endpos: int = None):
+        """Iterate over the non-overlapping matches in string, left to right.
+
+        Yields:
+            Match:
+        """
+        data = string.encode() if isinstance(string, str) else string
+        if endpos is None or endpos > len(data):
+            endpos = len(data)
+        if not self._may_match(data, pos, endpos):
+            return
+        vm = PikeVM(self._flat)
+        prefix = self._skip_prefix(data)
+        notempty = -1
+        while pos <= endpos:
+            regs = vm.search(data, pos, endpos, prefix, notempty)
+            if regs is None:
+                return
+            yield Match(self, string, data, regs)
+            # As in re since Python 3.7: after an empty match, search again at
+            # the same position, but don't accept the same empty match.
+            pos = regs[1]
+            notempty = pos if regs[0] == regs[1] else -1
+
+    def findall(self, string: 'str | bytes', pos: int = 0, endpos: int = None) -> list:
+        """All non-overlapping matches, as in re.findall(): the matched
+        strings if the pattern has no groups, the group if it has one, and
+        tuples of groups otherwise. Groups that did not participate give an
+        empty string.
+        """
+        empty = "" if isinstance(string, str) else b""
+        matches = self.finditer(string, pos, endpos)
+        if self.groups == 0:
+            return [m.group() for m in matches]
+        elif self.groups == 1:
+            return [m.groups(empty)[0] for m in matches]
+        return [m.groups(empty) for m in matches]
+
+
+class Match:
+    """Result of Pattern.search(). Positions are byte offsets."""
+    __slots__ = ("re", "string", "regs", "_data")
+
+    def __init__(self, re: Pattern, string: 'str | bytes', data: bytes, regs: 'tuple[int]'):
+        self.re = re
+        self.string = string
+        self.regs = regs
+        self._data = data
+
+    def __repr__(self):
+        return f"<Match span={self.span()}, match={self.group()!r}>"
+
+    def span(self, group: int = 0) -> 'tuple[int, int]':
+        if not 0 <= group <= self.re.groups:
+            raise IndexError("no such group")
+        return self.regs[2 * group], self.regs[2 * group + 1]
+
+    def start(self, group: int = 0) -> int:
+        return self.span(group)[0]
+
+    def end(self, group: int = 0) -> int:
+        return self.span(group)[1]
+
+    def group(self, *groups: int):
+        """Matched substring of each group, None for a group that did not
+        participate. group() is the whole match.
+        """
+        if len(groups) == 0:
+            groups = (0,)
+        result = []
+        for g in groups:
+            start, end = self.span(g)
+            if start < 0:
+                result.append(None)
+                continue
+            sub = self._data[start:end]
+            if isinstance(self.string, str):
+                sub = sub.decode(errors="replace")
+            elif isinstance(sub, memoryview):
+                # Not a view of a buffer the caller may go on to reuse.
+                sub = bytes(sub)
+            result.append(sub)
+        return result[0] if len(result) == 1 else tuple(result)
+
+    def groups(self, default=None) -> tuple:
+        return tuple(
+            default if g is None else g
+            for g in (self.group(k) for k in range(1, self.re.groups + 1))
+        )
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+_cache = collections.OrderedDict()
+_cache_lock = threading.Lock()
+_cache_maxsize = 512
+_cache_hits = 0
+_cache_misses = 0
+
+
+def compile(pattern: str) -> Pattern:
+    """Compile pattern, or return the cached Pattern for it.
+
+    Args:
+        pattern (str): regex
+
+    Raises:
+        ValueError: if the regex is malformed
+
+    Returns:
+        Pattern:
+    """
+    global _cache_hits, _cache_misses
+    with _cache_lock:
+        p = _cache.get(pattern)
+        if p is not None:
+            _cache.move_to_end(pattern)
+            _cache_hits += 1
+            return p
+        _cache_misses += 1
+
+    # Compile outside of the lock; two threads racing on the same new pattern
+    # both compile it and the second one wins, which is harmless.
+    p = Pattern(pattern)
+    with _cache_lock:
+        if _cache_maxsize > 0:
+            _cache[pattern] = p
+            _cache.move_to_end(pattern)
+            while len(_cache) > _cache_maxsize:
+                _cache.popitem(last=False)
+    return p
+
+
+def set_cache_size(maxsize: int):
+    """Resize the compile cache, evicting least recently used patterns.
+    maxsize=0 disables caching.
+    """
+    global _cache_maxsize
+    if maxsize < 0:
+        raise ValueError("maxsize must be >= 0")
+    with _cache_lock:
+        _cache_maxsize = maxsize
+        while len(_cache) > _cache_maxsize:
+            _cache.popitem(last=False)
+
+
+def cache_info() -> CacheInfo:
+    with _cache_lock:
+        return CacheInfo(_cache_hits, _cache_misses, _cache_maxsize, len(_cache))
+
+
+def purge():
+    """Clear the compile cache and its counters."""
+    global _cache_hits, _cache_misses
+    with _cache_lock:
+        _cache.clear()
+        _cache_hits = 0
+        _cache_misses = 0
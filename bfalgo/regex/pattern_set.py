@@ -0,0 +1,105 @@
+"""Match many patterns in one pass over the input.
+
+The NFAs of all patterns are built into one state list, each ending in a
+MATCHED state tagged with the pattern's index, and their start states are
+joined under a balanced tree of SPLIT states. Running the union once tells
+every pattern that matched:
+
+    >>> ps = PatternSet(["error(x|y)+timeout", "abc"], anchored=False)
+    >>> ps.match("... errorxytimeout ...")
+    [0]
+
+By default the union runs on the lazy DFA, whose state sets now carry the
+matched pattern ids; engine="nfa" simulates the flat NFA instead, which
+needs no cache memory.
+"""
+from bfalgo.regex import nfa
+from bfalgo.regex.dfa import DFA
+from bfalgo.regex.flat import FlatNFA
+from bfalgo.regex.stream import Matcher
+
+
+class PatternSet:
+    def __init__(self, patterns: 'list[str]', anchored: bool = True,
+                 max_mem: int = 8 << 20):
+        """
+        Args:
+            patterns (list[str]): regexes; a pattern's id is its index
+            anchored (bool, optional): a pattern matches the whole string
+                (True), or any substring (False). Defaults to True.
+            max_mem (int, optional): memory budget of the DFA cache. Defaults
+                to 8MB.
+
+        Raises:
+            ValueError: if a regex is malformed
+        """
+        if len(patterns) == 0:
+            raise ValueError("PatternSet needs at least one pattern")
+        self.patterns = list(patterns)
+        self.anchored = anchored
+
+        states = []
+        starts = []
+        for i, pattern in enumerate(self.patterns):
+            postfix = nfa.regex_to_postfix(pattern)
+            e = None if postfix is None else nfa.postfix_to_fragment(postfix, states)
+            if e is None:
+                raise ValueError(f"Bad regexp {pattern}")
+            s = nfa.new_state(states, nfa.MATCHED, None, None)
+            s.match_id = i
+            nfa.patch(e.out, s)
+            starts.append(e.start)
+
+        # Balanced split tree, so no pattern is more than log2(n) splits deep.
+        while len(starts) > 1:
+            joined = [
+                nfa.new_state(states, nfa.SPLIT, starts[k], starts[k + 1])
+                for k in range(0, len(starts) - 1, 2)
+            ]
+            if len(starts) % 2:
+                joined.append(starts[-1])
+            starts = joined
+
+        self.flat = FlatNFA.from_states(states, starts[0])
+        self.dfa = DFA(self.flat, max_mem=max_mem, anchored=anchored)
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def matcher(self) -> Matcher:
+        """A streaming Matcher over the DFA; see Matcher.matches."""
+        return Matcher(self.dfa)
+
+    def _match_nfa(self, string: bytes) -> 'set[int]':
+        flat = self.flat
+        op, out1 = flat.op, flat.out1
+        matched = set()
+        clist = flat.closure([flat.start])
+        for b in string:
+            if not self.anchored:
+                matched.update(out1[pc] for pc in clist if op[pc] == nfa.MATCHED)
+                clist = flat.closure(flat.step(clist, b) + [flat.start])
+            else:
+                clist = flat.step(clist, b)
+                if not clist:
+                    break
+        matched.update(out1[pc] for pc in clist if op[pc] == nfa.MATCHED)
+        return matched
+
+    def match(self, string: 'str | bytes', engine: str = "dfa") -> 'list[int]':
+        """Ids of the patterns that match string.
+
+        Args:
+            string (str | bytes): str is encoded as UTF-8
+            engine (str, optional): "dfa" or "nfa". Defaults to "dfa".
+
+        Returns:
+            list[int]: sorted pattern ids
+        """
+        if isinstance(string, str):
+            string = string.encode()
+        if engine == "dfa":
+            return sorted(self.dfa.run(string).matches)
+        elif engine == "nfa":
+            return sorted(self._match_nfa(string))
+        raise ValueError(f"Unknown engine {engine}")
@@ -0,0 +1,153 @@
+"""Pike VM: NFA simulation over the flat NFA with generation marks.
+
+The VM keeps a list of threads (NFA state ids) for the current input
+position. Adding a thread follows SPLIT arrows with an explicit stack, and
+each state is marked with the generation (the input position) it was last
+added for, in the manner of `lastlist` in Thompson's original code. A state
+is therefore added at most once per position, which bounds a step by the
+number of states and the whole match by O(len(pattern) x len(text)), even
+for patterns such as (a|a)* or a?^n a^n that make naive simulation blow up.
+
+search() runs the VM unanchored, adding a fresh thread at every position, and
+gives each thread its own tuple of capture slots updated by SAVE states.
+Threads are kept in priority order (out before out1 of a SPLIT, earlier start
+before later start), which yields the leftmost match with Perl-like
+preferences for alternation and greedy repetition, in one left-to-right pass.
+
+Ref:
+1. Russ Cox, "Regular Expression Matching: the Virtual Machine Approach"
+   (https://swtch.com/~rsc/regexp/regexp2.html)
+"""
+from bfalgo.regex.nfa import SPLIT, MATCHED, SAVE, CLASS
+from bfalgo.regex.flat import FlatNFA
+
+
+class PikeVM:
+    def __init__(self, nfa: FlatNFA):
+        self.nfa = nfa
+
+    def addthread(self, tlist: 'list[int]', pc: int, marks: 'list[int]', gen: int):
+        """Add the thread pc, and the threads its SPLIT arrows lead to, to
+        tlist. States already marked with gen are skipped.
+        """
+        op, out, out1 = self.nfa.op, self.nfa.out, self.nfa.out1
+        stack = [pc]
+        while stack:
+            pc = stack.pop()
+            if pc < 0 or marks[pc] == gen:
+                continue
+            marks[pc] = gen
+            if op[pc] == SPLIT:
+                # out is tried before out1
+                stack.append(out1[pc])
+                stack.append(out[pc])
+            elif op[pc] == SAVE:
+                stack.append(out[pc])
+            else:
+                tlist.append(pc)
+
+    def addthread_with_caps(self, tlist: 'list[tuple[int, tuple]]', pc: int,
+                            caps: tuple, pos: int, marks: 'list[int]', gen: int):
+        """Same as addthread(), but a thread is a (pc, caps) pair, and SAVE
+        states record pos in their slot of caps.
+        """
+        op, out, out1 = self.nfa.op, self.nfa.out, self.nfa.out1
+        stack = [(pc, caps)]
+        while stack:
+            pc, caps = stack.pop()
+            if pc < 0 or marks[pc] == gen:
+                continue
+            marks[pc] = gen
+            if op[pc] == SPLIT:
+                stack.append((out1[pc], caps))
+                stack.append((out[pc], caps))
+            elif op[pc] == SAVE:
+                slot = out1[pc]
+                stack.append((out[pc], caps[:slot] + (pos,) + caps[slot + 1:]))
+            else:
+                tlist.append((pc, caps))
+
+    def match(self, string: 'str | bytes') -> bool:
+        """Anchored whole-string match, same semantics as nfa.match().
+
+        Args:
+            string (str | bytes): str is encoded as UTF-8
+
+        Returns:
+            bool:
+        """
+        if isinstance(string, str):
+            string = string.encode()
+        op, out, out1, classes = self.nfa.op, self.nfa.out, self.nfa.out1, self.nfa.classes
+        marks = [-1] * len(self.nfa)
+        clist = []
+        self.addthread(clist, self.nfa.start, marks, 0)
+        gen = 0
+        for b in string:
+            gen += 1
+            nlist = []
+            for pc in clist:
+                if op[pc] == b or (op[pc] == CLASS and classes[out1[pc]][b]):
+                    self.addthread(nlist, out[pc], marks, gen)
+            if not nlist:
+                return False
+            clist = nlist
+        return any(op[pc] == MATCHED for pc in clist)
+
+    def search(self, string: bytes, pos: int = 0, endpos: int = None,
+               prefix: bytes = b"", notempty: int = -1) -> 'tuple[int]':
+        """Find the leftmost match in string[pos:endpos].
+
+        Args:
+            string (bytes):
+            pos (int, optional): where the search starts. Defaults to 0.
+            endpos (int, optional): where the search stops. Defaults to
+                len(string).
+            prefix (bytes, optional): a literal every match starts with. While
+                no thread is alive, the scan jumps to its next occurrence.
+                Defaults to b"".
+            notempty (int, optional): an empty match at this position is not
+                accepted (used by finditer() after an empty match). Defaults
+                to -1.
+
+        Returns:
+            tuple[int]: capture slots: the match spans string[slots[0]:slots[1]],
+                group k spans string[slots[2k]:slots[2k+1]] (-1 if the group
+                did not participate). None if there is no match.
+        """
+        op, out, out1, classes = self.nfa.op, self.nfa.out, self.nfa.out1, self.nfa.classes
+        start = self.nfa.start
+        if endpos is None or endpos > len(string):
+            endpos = len(string)
+        marks = [-1] * len(self.nfa)
+        empty = (-1,) * self.nfa.nslots
+        matched = None
+        clist = []
+        i = pos
+        while i <= endpos:
+            if matched is None:
+                if not clist and prefix:
+                    i = string.find(prefix, i, endpos)
+                    if i < 0:
+                        break
+                # Lowest priority: a match starting here loses to the
+                # threads that started earlier.
+                self.addthread_with_caps(
+                    clist, start, (i,) + empty[1:], i, marks, i
+                )
+            elif not clist:
+                break
+            b = string[i] if i < endpos else -1
+            nlist = []
+            for pc, caps in clist:
+                if op[pc] == MATCHED:
+                    if i == notempty and caps[0] == i:
+                        continue
+                    # Threads after this one have lower priority; cut them.
+                    matched = caps[:1] + (i,) + caps[2:]
+                    break
+                if op[pc] == b or (op[pc] == CLASS and b >= 0 and classes[out1[pc]][b]):
+                    self.addthread_with_caps(nlist, out[pc], caps, i + 1, marks, i + 1)
+            clist = nlist
+            i += 1
+        return matched
@@ -0,0 +1,208 @@
+"""Literal prefilter: reject inputs that cannot match without running an
+automaton.
+
+The postfix expression is evaluated on a stack, like postfix_to_nfa() does,
+but each sub-expression is summarized by an Info instead of a fragment:
+
+    exact     the set of strings it matches, while that set is small
+    prefix    a literal every match starts with
+    suffix    a literal every match ends with
+    required  literal clauses; every match contains at least one literal
+              of each clause
+
+Concatenating x and y also requires x.suffix + y.prefix, which is how
+literals spelled out character by character (t.i.m.e...) grow back into
+whole words.
+
+For error(x|y)+timeout this gives prefix b"error" and the clauses
+{b"error"}, {b"x", b"y"}, {b"timeout"}. bytes.find() runs at C speed, so
+checking the clauses first is much cheaper than stepping the DFA through a
+line that cannot match.
+
+Ref:
+1. Russ Cox, "Regular Expression Matching with a Trigram Index"
+   (https://swtch.com/~rsc/regexp/regexp4.html)
+"""
+from typing import NamedTuple
+
+from bfalgo.regex.charclass import postfix_tokens, parse_atom
+
+
+MAX_EXACT = 16  # largest exact set kept before falling back to clauses
+MAX_CLAUSES = 4  # clauses checked by Prefilter.may_match()
+MAX_CLASS = 4  # largest class expanded into an exact set, eg. [xy]
+
+
+class Info(NamedTuple):
+    exact: frozenset  # None if unknown or too large
+    prefix: bytes
+    suffix: bytes
+    required: tuple  # of frozenset's of bytes
+
+
+NO_INFO = Info(None, b"", b"", ())
+
+
+def _common_prefix(strings) -> bytes:
+    strings = list(strings)
+    if len(strings) == 0:
+        return b""
+    first, last = min(strings), max(strings)
+    n = 0
+    while n < len(first) and first[n] == last[n]:
+        n += 1
+    return first[:n]
+
+
+def _common_suffix(strings) -> bytes:
+    return _common_prefix([s[::-1] for s in strings])[::-1]
+
+
+def _from_exact(exact: frozenset) -> Info:
+    return Info(exact, _common_prefix(exact), _common_suffix(exact), ())
+
+
+def _implies(d: frozenset, c: frozenset) -> bool:
+    """Whether satisfying clause d always satisfies clause c."""
+    return all(any(t in s for t in c) for s in d)
+
+
+def _prune(clauses) -> tuple:
+    """Drop empty-literal clauses, and clauses implied by another one."""
+    clauses = [c for c in dict.fromkeys(clauses) if b"" not in c]
+    return tuple(
+        c for i, c in enumerate(clauses)
+        if not any(j != i and _implies(d, c) and not (_implies(c, d) and j > i)
+                   for j, d in enumerate(clauses))
+    )
+
+
+def _clauses(info: Info) -> tuple:
+    """All clauses of info, turning a usable exact set into one more."""
+    if info.exact is not None and b"" not in info.exact:
+        return (info.exact,) + info.required
+    return info.required
+
+
+def _atom(tok: str) -> Info:
+    info = _from_exact(frozenset([b""]))
+    for item in parse_atom(tok):
+        if isinstance(item, int):
+            members = [item]
+        else:
+            members = [b for b in range(256) if item[b]]
+            if len(members) > MAX_CLASS:
+                # Matches one byte, but nothing useful is known about it.
+                members = None
+        if members is None:
+            x = Info(None, b"", b"", ())
+        else:
+            x = _from_exact(frozenset(bytes([b]) for b in members))
+        info = _concat(info, x)
+    return info
+
+
+def _concat(x: Info, y: Info) -> Info:
+    if x.exact is not None and y.exact is not None \
+            and len(x.exact) * len(y.exact) <= MAX_EXACT:
+        return _from_exact(frozenset(a + b for a in x.exact for b in y.exact))
+    if x.exact is not None and len(x.exact) == 1:
+        prefix = next(iter(x.exact)) + y.prefix
+    else:
+        prefix = x.prefix
+    if y.exact is not None and len(y.exact) == 1:
+        suffix = x.suffix + next(iter(y.exact))
+    else:
+        suffix = y.suffix
+    required = _clauses(x) + _clauses(y) + (frozenset([x.suffix + y.prefix]),)
+    return Info(None, prefix, suffix, _prune(required))
+
+
+def _alternate(x: Info, y: Info) -> Info:
+    if x.exact is not None and y.exact is not None \
+            and len(x.exact) + len(y.exact) <= MAX_EXACT:
+        return _from_exact(x.exact | y.exact)
+    prefix = _common_prefix([x.prefix, y.prefix])
+    suffix = _common_suffix([x.suffix, y.suffix])
+    # (x needs one of cx) or (y needs one of cy) => one of cx | cy is needed.
+    cx, cy = _clauses(x), _clauses(y)
+    if cx and cy:
+        best = lambda cs: max(cs, key=lambda c: min(len(s) for s in c))
+        return Info(None, prefix, suffix, (best(cx) | best(cy),))
+    return Info(None, prefix, suffix, ())
+
+
+def analyze(postfix: str) -> Info:
+    """Summarize a postfix expression, see Info.
+
+    Args:
+        postfix (str): output of regex_to_postfix()
+
+    Returns:
+        Info:
+    """
+    stack = []
+    for rc in postfix_tokens(postfix):
+        if rc == '.':
+            y = stack.pop()
+            x = stack.pop()
+            stack.append(_concat(x, y))
+        elif rc == '|':
+            y = stack.pop()
+            x = stack.pop()
+            stack.append(_alternate(x, y))
+        elif rc == ')':
+            pass
+        elif rc == '*':
+            stack.pop()
+            stack.append(NO_INFO)
+        elif rc == '?':
+            x = stack.pop()
+            if x.exact is not None:
+                stack.append(_from_exact(x.exact | {b""}))
+            else:
+                stack.append(NO_INFO)
+        elif rc == '+':
+            x = stack.pop()
+            stack.append(Info(None, x.prefix, x.suffix, _clauses(x)))
+        else:
+            stack.append(_atom(rc))
+    return stack.pop()
+
+
+class Prefilter:
+    def __init__(self, postfix: str):
+        info = analyze(postfix)
+        self.prefix = info.prefix
+        # A clause with an empty literal is always satisfied; longer literals
+        # are rarer, so they are both more selective and checked first.
+        clauses = list(_prune(_clauses(info)))
+        clauses.sort(key=lambda c: -min(len(s) for s in c))
+        self.required = [tuple(sorted(c, key=lambda s: (-len(s), s)))
+                         for c in clauses[:MAX_CLAUSES]]
+
+    def __repr__(self):
+        return f"Prefilter(prefix={self.prefix!r}, required={self.required})"
+
+    def may_match(self, data: bytes, pos: int = 0, endpos: int = None,
+                  anchored: bool = False) -> bool:
+        """False if data[pos:endpos] certainly doesn't match.
+
+        Args:
+            data (bytes):
+            pos (int, optional): Defaults to 0.
+            endpos (int, optional): Defaults to len(data).
+            anchored (bool, optional): the match must start at pos. Defaults
+                to False.
+
+        Returns:
+            bool:
+        """
+        if endpos is None:
+            endpos = len(data)
+        if anchored and not data.startswith(self.prefix, pos, endpos):
+            return False
+        for clause in self.required:
+            if all(data.find(s, pos, endpos) < 0 for s in clause):
+                return False
+        return True
@@ -0,0 +1,116 @@
+"""Incremental matching over chunked input.
+
+A Matcher keeps the current lazy-DFA state between chunks, so a file of any
+size is scanned in constant memory:
+
+    >>> m = compile("a(b|c)*d").matcher()
+    >>> m.feed(b"abc")
+    False
+    >>> m.feed(b"bd")
+    False
+    >>> m.finish()
+    True
+
+feed() accepts anything exposing the buffer protocol (bytes, bytearray,
+memoryview, mmap, array) and reads it as raw bytes, without decoding. It
+returns True once the outcome is decided (the DFA died, or an unanchored
+matcher found every pattern), after which further input is ignored.
+"""
+import mmap
+
+from bfalgo.regex.dfa import DFA
+
+
+class Matcher:
+    def __init__(self, dfa: DFA):
+        self.dfa = dfa
+        self.state = dfa.start_state()
+        self.nbytes = 0  # bytes consumed so far
+
+    @property
+    def done(self) -> bool:
+        return self.state.decided
+
+    @property
+    def matches(self) -> 'list[int]':
+        """Ids of the patterns matched by the input so far (see PatternSet)."""
+        return sorted(self.state.matches)
+
+    def feed(self, chunk) -> bool:
+        """Consume the next chunk of input.
+
+        Args:
+            chunk (bytes-like):
+
+        Returns:
+            bool: whether the outcome is decided
+        """
+        d = self.state
+        if d.decided:
+            return True
+        if not isinstance(chunk, (bytes, bytearray)):
+            chunk = memoryview(chunk).cast('B')
+        transition = self.dfa.transition
+        n = 0
+        for c in self.dfa.translate(chunk):
+            n += 1
+            nd = d.next[c]
+            if nd is None:
+                nd = transition(d, c)
+            d = nd
+            if d.decided:
+                break
+        self.state = d
+        self.nbytes += n
+        return d.decided
+
+    def finish(self) -> bool:
+        """End of input.
+
+        Returns:
+            bool: whether the input matched
+        """
+        return self.state.is_match
+
+    def feed_file(self, f, chunk_size: int = 1 << 20) -> bool:
+        """Feed a binary file object, chunk_size bytes at a time, through one
+        reusable buffer. Stops reading as soon as the outcome is decided.
+
+        Returns:
+            bool: whether the input matched
+        """
+        buf = bytearray(chunk_size)
+        view = memoryview(buf)
+        while not self.done:
+            n = f.readinto(buf)
+            if not n:
+                break
+            self.feed(view[:n])
+        return self.finish()
+
+
+def match_file(dfa: DFA, path: str, chunk_size: int = 1 << 20) -> Matcher:
+    """Memory-map the file at path and run a Matcher over it, chunk by chunk.
+
+    Args:
+        dfa (DFA): e.g. Pattern.dfa, or PatternSet.dfa
+        path (str):
+        chunk_size (int, optional): Defaults to 1MB.
+
+    Returns:
+        Matcher: finished matcher; see finish() and matches
+    """
+    matcher = Matcher(dfa)
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped.
+            return matcher
+        with mm:
+            view = memoryview(mm)
+            for i in range(0, len(mm), chunk_size):
+                if matcher.feed(view[i:i + chunk_size]):
+                    break
+            view.release()
+    return matcher
@@ -0,0 +1,409 @@
+import random
+
+from bfalgo.decision_tree import decision_tree_annotated_oop as dt
+from bfalgo.decision_tree.decision_tree_annotated_oop import (
+    BinnedColumns,
+    Columns,
+    DecisionTree,
+    quantize,
+)
+from bfalgo.decision_tree import random_forest as rf
+from bfalgo.decision_tree.random_forest import RandomForest
+import numpy as np
+import pytest
+
+
+MOCK = [
+    {"length": 10, "keyword": "post", "last_height": 3, "label": "api"},
+    {"length": 10, "keyword": "post", "last_height": 3, "label": "api"},
+    {"length": 10, "keyword": "post", "last_height": 5, "label": "params"},
+    {"length": 20, "keyword": "post", "last_height": 5, "label": "params"},
+    {"length": 30, "keyword": "post", "last_height": 5, "label": "params"},
+    {"length": 10, "keyword": "200", "last_height": 5, "label": "response"},
+    {"length": 30, "keyword": "300", "last_height": 5, "label": "response"},
+    {"length": 40, "keyword": "404", "last_height": 5, "label": "response"},
+]
+
+
+def make_records(n, seed=0):
+    rng = random.Random(seed)
+    data = []
+    for _ in range(n):
+        d = {
+            "a": rng.randint(0, 9),
+            "b": rng.choice("xyzw"),
+            "c": round(rng.gauss(0, 1), 2),
+        }
+        label = "P" if d["a"] >= 4 and d["b"] != "z" else "Q"
+        d["label"] = label if rng.random() < 0.9 else rng.choice("PQR")
+        data.append(d)
+    return data
+
+
+def depth(tree):
+    if isinstance(tree, DecisionTree.Leaf):
+        return 0
+    return 1 + max(depth(t) for t in tree.subtree.values())
+
+
+def best_gain(model, data):
+    """The best entropy gain of any split of data, by brute force."""
+    old = model.get_entropy(data)
+    best = 0
+    for ft in data[0]:
+        if ft == model.label_col:
+            continue
+        for d in data:
+            s = model.split(data, ft, d[ft])
+            new = (
+                len(s["matched"]) * model.get_entropy(s["matched"])
+                + len(s["unmatched"]) * model.get_entropy(s["unmatched"])
+            ) / len(data)
+            best = max(best, old - new)
+    return best
+
+
+class TestFit:
+    def test_mock(self):
+        model = DecisionTree(label_col="label")
+        model.fit(MOCK)
+        assert model.tree == DecisionTree.Split(
+            {
+                "matched": DecisionTree.Split(
+                    {
+                        "matched": DecisionTree.Leaf("params"),
+                        "unmatched": DecisionTree.Leaf("api"),
+                    },
+                    "last_height",
+                    5,
+                    ">=",
+                ),
+                "unmatched": DecisionTree.Leaf("response"),
+            },
+            "keyword",
+            "post",
+            "==",
+        )
+        assert [model.predict(d) for d in MOCK] == [d["label"] for d in MOCK]
+
+    @pytest.mark.parametrize('seed', range(5))
+    def test_best_split(self, seed):
+        data = make_records(60, seed)
+        model = DecisionTree(label_col="label", max_depth=1)
+        model.fit(data)
+        tree = model.tree
+        s = model.split(data, tree.feature, tree.pivot)
+        assert s["predicate"] == tree.predicate
+        gain = model.get_entropy(data) - (
+            len(s["matched"]) * model.get_entropy(s["matched"])
+            + len(s["unmatched"]) * model.get_entropy(s["unmatched"])
+        ) / len(data)
+        assert gain == pytest.approx(best_gain(model, data))
+        for child in tree.subtree.values():
+            assert isinstance(child, DecisionTree.Leaf)
+
+    def test_unlimited_depth_by_default(self):
+        # Ten classes take at least four levels of binary splits.
+        data = [{"a": i % 10, "b": i % 3, "label": str(i % 10)} for i in range(200)]
+        model = DecisionTree(label_col="label")
+        model.fit(data)
+        assert depth(model.tree) >= 4
+        assert [model.predict(d) for d in data] == [d["label"] for d in data]
+
+    @pytest.mark.parametrize('max_depth', [1, 2, 4, None])
+    def test_max_depth(self, max_depth):
+        data = make_records(500)
+        model = DecisionTree(label_col="label", max_depth=max_depth)
+        model.min_entropy_gain = 0
+        model.fit(data)
+        if max_depth is None:
+            # Rows with equal features and different labels cannot be told apart.
+            seen = {}
+            for d in data:
+                seen.setdefault((d["a"], d["b"], d["c"]), set()).add(d["label"])
+            right = sum(model.predict(d) == d["label"] for d in data)
+            assert right >= sum(len(v) == 1 for v in seen.values())
+        else:
+            assert depth(model.tree) <= max_depth
+
+    def test_large(self):
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(20000, 3))
+        data = [
+            {"x0": a, "x1": b, "x2": c, "label": int(a + b > 0)}
+            for a, b, c in X.tolist()
+        ]
+        model = DecisionTree(label_col="label", max_depth=6)
+        model.fit(data)
+        right = sum(model.predict(d) == d["label"] for d in data[:500])
+        assert right > 450
+
+
+class TestHistogram:
+    @pytest.mark.parametrize('n_bins', [2, 16, 256])
+    def test_quantize(self, n_bins):
+        col = np.random.default_rng(0).exponential(size=5000)
+        bins, edges = quantize(col, n_bins)
+        assert len(edges) <= n_bins
+        assert np.isin(edges, col).all()
+        assert (col >= edges[bins]).all()
+        upper = np.r_[edges, np.inf][bins.astype(int) + 1]
+        assert (col < upper).all()
+        counts = np.bincount(bins)
+        assert counts.max() <= 2 * len(col) / n_bins
+
+    def test_subtraction(self):
+        binned = BinnedColumns(Columns.from_records(make_records(300), "label"), 8)
+        idx = np.arange(300)
+        matched = binned.matches(0, 3, idx)
+        parent = binned.histograms(idx)
+        small = binned.histograms(idx[matched])
+        large = binned.histograms(idx[~matched])
+        for p, s, l in zip(parent, small, large):
+            assert np.array_equal(p - s, l)
+
+    @pytest.mark.parametrize('seed', range(20))
+    def test_few_values_are_exact(self, seed):
+        rng = random.Random(seed)
+        k = rng.randint(3, 5)
+        data = [
+            {
+                "a": rng.randint(0, k - 1),
+                "b": rng.choice("xyzw"[: k - 1]),
+                "c": round(rng.gauss(0, 1)),
+                "label": rng.choice("PQR"),
+            }
+            for _ in range(rng.randint(2, 60))
+        ]
+        exact = DecisionTree(label_col="label")
+        exact.fit(data)
+        model = DecisionTree(label_col="label", n_bins=16)
+        model.fit(data)
+        assert model.tree == exact.tree
+
+    def test_large(self):
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(20000, 3))
+        data = [
+            {"x0": a, "x1": b, "x2": c, "label": int(a + b > 0)}
+            for a, b, c in X.tolist()
+        ]
+        model = DecisionTree(label_col="label", max_depth=6, n_bins=32)
+        model.fit(data)
+        right = sum(model.predict(d) == d["label"] for d in data[:500])
+        assert right > 450
+
+    @pytest.mark.parametrize('n_bins', [0, 1, 257])
+    def test_invalid(self, n_bins):
+        with pytest.raises(ValueError):
+            DecisionTree(label_col="label", n_bins=n_bins)
+
+
+class TestParallel:
+    @pytest.mark.parametrize('n_bins', [None, 16])
+    @pytest.mark.parametrize('n_jobs, task_rows', [(2, 200), (2, 5000), (-1, 50)])
+    def test_same_tree(self, n_bins, n_jobs, task_rows):
+        data = make_records(2000)
+        serial = DecisionTree(label_col="label", max_depth=None, n_bins=n_bins)
+        serial.fit(data)
+        model = DecisionTree(
+            label_col="label",
+            max_depth=None,
+            n_bins=n_bins,
+            n_jobs=n_jobs,
+            task_rows=task_rows,
+        )
+        model.fit(data)
+        assert model.tree == serial.tree
+        assert model._threads is None and model._processes is None
+
+    def test_refit(self, monkeypatch):
+        pools = []
+
+        class Pool(dt.ProcessPoolExecutor):
+            def __init__(self, *args, **kwargs):
+                pools.append(kwargs)
+                super().__init__(*args, **kwargs)
+
+        monkeypatch.setattr(dt, "ProcessPoolExecutor", Pool)
+        model = DecisionTree(label_col="label", n_jobs=2, task_rows=100)
+        model.fit(make_records(500, 0))
+        data = make_records(500, 1)
+        model.fit(data)
+        serial = DecisionTree(label_col="label")
+        serial.fit(data)
+        assert model.tree == serial.tree
+        for kwargs in pools:
+            assert kwargs["mp_context"].get_start_method() == "forkserver"
+            worker_model = kwargs["initargs"][0]
+            assert not hasattr(worker_model, "tree")
+            assert not hasattr(worker_model, "flat")
+
+    @pytest.mark.parametrize('n_jobs', [0, -2])
+    def test_invalid(self, n_jobs):
+        with pytest.raises(ValueError):
+            DecisionTree(label_col="label", n_jobs=n_jobs)
+
+
+class TestPredictBatch:
+    @pytest.mark.parametrize('n_bins', [None, 8])
+    @pytest.mark.parametrize('max_depth', [1, 3, None])
+    def test_same_as_predict(self, n_bins, max_depth):
+        data = make_records(1000)
+        model = DecisionTree(label_col="label", max_depth=max_depth, n_bins=n_bins)
+        model.fit(data)
+        expected = [model.predict(d) for d in data]
+        assert model.predict_batch(data).tolist() == expected
+        X = np.array([[d["a"], d["b"], d["c"]] for d in data], dtype=object)
+        assert model.predict_batch(X).tolist() == expected
+
+    def test_flatten(self):
+        model = DecisionTree(label_col="label")
+        model.fit(MOCK)
+        flat = model.flat
+        assert flat.feature.tolist() == [1, 2, -1, -1, -1]
+        assert flat.numeric.tolist()[:2] == [False, True]
+        assert flat.threshold.tolist()[:2] == [0, 5]
+        assert flat.matched.tolist()[:2] == [1, 3]
+        assert flat.unmatched.tolist()[:2] == [2, 4]
+        assert model.schema.labels()[flat.value[2:]].tolist() == [
+            "response", "params", "api"
+        ]
+
+    def test_unseen_category(self):
+        model = DecisionTree(label_col="label")
+        model.fit(MOCK)
+        unseen = {"length": 10, "keyword": "get", "last_height": 3}
+        assert model.predict_batch([unseen]).tolist() == [model.predict(unseen)]
+
+    @pytest.mark.parametrize('labels', [(1, "odd"), (1, 2.5), (True, 2)])
+    def test_labels(self, labels):
+        data = [dict(d, label=labels[i % 2]) for i, d in enumerate(MOCK)]
+        model = DecisionTree(label_col="label")
+        model.fit(data)
+        predictions = model.predict_batch(data).tolist()
+        expected = [model.predict(d) for d in data]
+        assert predictions == expected
+        assert [type(p) for p in predictions] == [type(p) for p in expected]
+
+    def test_numeric_matrix(self):
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(5000, 3))
+        data = [
+            {"x0": a, "x1": b, "x2": c, "label": int(a + b > 0)}
+            for a, b, c in X[:2000].tolist()
+        ]
+        model = DecisionTree(label_col="label", max_depth=8)
+        model.fit(data)
+        predictions = model.predict_batch(X)
+        assert predictions.dtype == np.int64
+        assert predictions[:100].tolist() == [model.predict(d) for d in data[:100]]
+        assert (predictions == (X[:, 0] + X[:, 1] > 0)).mean() > 0.9
+
+
+class TestRandomForest:
+    def test_grow_on_rows(self):
+        data = make_records(500)
+        rows = np.random.default_rng(0).integers(0, 500, 500)
+        model = DecisionTree(label_col="label", max_depth=None)
+        tree = model.grow(Columns.from_records(data, "label"), rows)
+        assert tree == model.build_tree([data[i] for i in np.sort(rows)])
+
+    def test_same_forest_whatever_n_jobs(self):
+        train, test = make_records(1000, 1), make_records(300, 2)
+        votes = []
+        for n_jobs in [None, 2]:
+            forest = RandomForest(
+                label_col="label", n_trees=8, max_features=2, n_jobs=n_jobs, seed=3
+            )
+            forest.fit(train)
+            votes.append(forest.votes(test))
+        assert np.array_equal(*votes)
+        assert (votes[0].sum(axis=1) == 8).all()
+
+    def test_forkserver(self, monkeypatch):
+        contexts = []
+
+        class Pool(rf.ProcessPoolExecutor):
+            def __init__(self, *args, **kwargs):
+                contexts.append(kwargs["mp_context"].get_start_method())
+                super().__init__(*args, **kwargs)
+
+        monkeypatch.setattr(rf, "ProcessPoolExecutor", Pool)
+        forest = RandomForest(label_col="label", n_trees=2, n_jobs=2)
+        forest.fit(make_records(200))
+        assert contexts == ["forkserver"]
+
+    def test_quantize_once(self, monkeypatch):
+        calls = []
+
+        def quantize(col, n_bins):
+            calls.append(n_bins)
+            return dt_quantize(col, n_bins)
+
+        dt_quantize = dt.quantize
+        monkeypatch.setattr(dt, "quantize", quantize)
+        train, test = make_records(1000, 1), make_records(300, 2)
+        votes = []
+        for n_jobs in [None, 2]:
+            forest = RandomForest(
+                label_col="label", n_trees=6, n_bins=8, n_jobs=n_jobs, seed=3
+            )
+            forest.fit(train)
+            votes.append(forest.votes(test))
+        # Two numeric features, "a" and "c", once per fit.
+        assert calls == [8] * 4
+        assert np.array_equal(*votes)
+
+    def test_no_sampling(self):
+        data = make_records(500)
+        forest = RandomForest(
+            label_col="label",
+            n_trees=3,
+            max_features=None,
+            bootstrap=False,
+            min_entropy_gain=0.1,
+        )
+        forest.fit(data)
+        model = DecisionTree(label_col="label", max_depth=None)
+        model.fit(data)
+        assert all(tree.tree == model.tree for tree in forest.trees)
+        assert forest.predict_batch(data).tolist() == model.predict_batch(data).tolist()
+        assert forest.predict(data[0]) == model.predict(data[0])
+
+    def test_accuracy(self):
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(3000, 6))
+        y = (X[:, 0] * X[:, 1] + X[:, 2] > 0).astype(int)
+        data = [dict(zip("abcdef", x), label=label) for x, label in zip(X.tolist(), y)]
+        forest = RandomForest(label_col="label", n_trees=25, max_features=3, seed=0)
+        forest.fit(data[:2000])
+        model = DecisionTree(label_col="label", max_depth=None)
+        model.min_entropy_gain = 0
+        model.fit(data[:2000])
+        forest_accuracy = (forest.predict_batch(X[2000:]) == y[2000:]).mean()
+        assert forest_accuracy > (model.predict_batch(X[2000:]) == y[2000:]).mean()
+        assert forest_accuracy > 0.85
+
+    @pytest.mark.parametrize('n_bins', [None, 16])
+    def test_max_features(self, n_bins):
+        data = make_records(2000)
+        trees = []
+        for n_jobs in [None, 2]:
+            model = DecisionTree(
+                label_col="label",
+                max_depth=None,
+                n_bins=n_bins,
+                n_jobs=n_jobs,
+                task_rows=300,
+            )
+            model.max_features, model.seed = 1, 7
+            model.fit(data)
+            trees.append(model.tree)
+        assert trees[0] == trees[1]
+
+    @pytest.mark.parametrize('max_features', ["log", -0.5, 1.5, 0, True, False])
+    def test_invalid(self, max_features):
+        forest = RandomForest(label_col="label", max_features=max_features)
+        with pytest.raises(ValueError):
+            forest.fit(MOCK)
@@ -0,0 +1,468 @@
+import pathlib
+import threading
+
+from bfalgo.neural_network.activations import get_activation
+from bfalgo.neural_network import callbacks, profiling
+from bfalgo.neural_network.callbacks import Callback, Evaluator
+from bfalgo.neural_network.loader import BatchLoader
+from bfalgo.neural_network.network import PHASES, Network
+from bfalgo.neural_network.optimizers import Adam, get_optimizer
+from bfalgo.neural_network.parallel import parallel_SGD
+from bfalgo.neural_network.profiling import Metrics, profile_SGD
+import numpy as np
+import pytest
+
+
+def make_data(n, sizes, seed=0):
+    """Linearly separable toy data: the label is the argmax of a random
+    projection of x.
+    """
+    rng = np.random.default_rng(seed)
+    X = rng.random((n, sizes[0]))
+    labels = np.argmax(X @ rng.standard_normal((sizes[0], sizes[-1])), axis=1)
+    y = np.eye(sizes[-1])[labels]
+    return X, y
+
+
+class TestBackprop:
+    @pytest.mark.parametrize('sizes', [[6, 4, 3], [5, 7, 4, 2]])
+    def test_batch_equals_sum_of_samples(self, sizes):
+        np.random.seed(0)
+        net = Network(sizes)
+        X, y = make_data(8, sizes)
+        nabla_w, nabla_b = net.backprop(X, y)
+        for one_x, one_y in zip(X, y):
+            nw, nb = net.backprop(one_x, one_y)
+            nabla_w = [a - b for a, b in zip(nabla_w, nw)]
+            nabla_b = [a - b for a, b in zip(nabla_b, nb)]
+        assert all(np.allclose(nw, 0) for nw in nabla_w)
+        assert all(np.allclose(nb, 0) for nb in nabla_b)
+
+    def test_numerical_gradient(self):
+        np.random.seed(1)
+        net = Network([4, 5, 3])
+        X, y = make_data(3, net.sizes)
+        nabla_w, _ = net.backprop(X, y)
+        loss = lambda: 0.5 * np.sum((net.forward(X)[-1] - y) ** 2)
+        eps = 1e-6
+        w = net.weights[0]
+        for idx in [(0, 0), (2, 3), (3, 4)]:
+            w0 = w[idx]
+            w[idx] = w0 + eps
+            up = loss()
+            w[idx] = w0 - eps
+            down = loss()
+            w[idx] = w0
+            assert (up - down) / (2 * eps) == pytest.approx(nabla_w[0][idx], rel=1e-4)
+
+
+class TestSGD:
+    def test_learns(self, capsys):
+        np.random.seed(2)
+        net = Network([8, 16, 3])
+        net.epochs, net.batch_size, net.eta = 5, 10, 3.0
+        X, y = make_data(600, net.sizes)
+        net.SGD(X, y, X, y)
+        acc = np.mean(np.argmax(net.forward(X)[-1], axis=1) == np.argmax(y, axis=1))
+        assert acc > 0.8
+
+
+class TestInPlace:
+    @pytest.mark.parametrize('kind', ['sigmoid', 'tanh', 'linear'])
+    def test_backprop_into(self, kind):
+        np.random.seed(3)
+        net = Network([6, 5, 4, 3], kind)
+        X, y = make_data(7, net.sizes)
+        ws = net.workspace(7)
+        ws.x[...], ws.y[...] = X, y
+        nabla_w, nabla_b = net.backprop(X, y)
+        nw, nb = net.backprop_into(ws)
+        assert all(np.allclose(a, b) for a, b in zip(nabla_w + nabla_b, nw + nb))
+        assert net.workspace(7) is ws
+
+    def test_sgd_same_as_default(self, capsys):
+        X, y = make_data(200, [8, 6, 3])
+        nets = []
+        for in_place in [False, True]:
+            np.random.seed(4)
+            net = Network([8, 6, 3])
+            net.epochs, net.batch_size, net.in_place = 2, 20, in_place
+            weights = net.weights[0]
+            net.SGD(X.astype(np.float32), y, X, y)
+            nets.append(net)
+        assert nets[1].weights[0] is weights
+        for a, b in zip(nets[0].weights + nets[0].biases, nets[1].weights + nets[1].biases):
+            assert np.allclose(a, b)
+
+
+class TestDtype:
+    @pytest.mark.parametrize('in_place', [False, True])
+    @pytest.mark.parametrize('master_dtype', [None, np.float64])
+    def test_float32(self, in_place, master_dtype, capsys):
+        np.random.seed(5)
+        net = Network([8, 16, 3], dtype=np.float32, master_dtype=master_dtype)
+        net.epochs, net.batch_size, net.eta, net.in_place = 5, 10, 3.0, in_place
+        X, y = make_data(600, net.sizes)
+        net.SGD(X, y, X, y)
+        assert all(w.dtype == np.float32 for w in net.weights + net.biases)
+        if master_dtype is not None:
+            assert all(w.dtype == np.float64 for w in net.master_weights)
+            assert np.allclose(net.weights[0], net.master_weights[0], atol=1e-6)
+        out = net.forward(X)[-1]
+        assert out.dtype == np.float32
+        assert np.mean(np.argmax(out, axis=1) == np.argmax(y, axis=1)) > 0.8
+
+    def test_backprop_dtype(self):
+        np.random.seed(6)
+        net64 = Network([6, 5, 3])
+        np.random.seed(6)
+        net32 = Network([6, 5, 3], dtype=np.float32)
+        X, y = make_data(4, net64.sizes)
+        nw64, _ = net64.backprop(X, y)
+        nw32, _ = net32.backprop(X, y)
+        assert nw32[0].dtype == np.float32
+        assert np.allclose(nw32[0], nw64[0], atol=1e-5)
+
+
+class TestPredict:
+    @pytest.mark.parametrize('batch_size', [1, 7, 50, 1000])
+    def test_chunks(self, batch_size):
+        np.random.seed(7)
+        net = Network([8, 6, 3])
+        X, y = make_data(50, net.sizes)
+        assert np.allclose(net.predict(X, batch_size), net.forward(X)[-1])
+        acc = np.mean(np.argmax(net.forward(X)[-1], axis=1) == np.argmax(y, axis=1))
+        assert net.evaluate(X, y, batch_size=batch_size) == pytest.approx(acc)
+        assert net.evaluate(X, np.argmax(y, axis=1), batch_size=batch_size) == pytest.approx(acc)
+
+    def test_unflattened(self):
+        net = Network([8, 6, 3])
+        X, y = make_data(20, net.sizes)
+        assert np.allclose(net.predict(X.reshape(20, 2, 4), 7), net.predict(X, 7))
+        assert net.evaluate(X.reshape(20, 2, 4), y, batch_size=7) == net.evaluate(X, y)
+
+    def test_print(self, capsys):
+        net = Network([8, 6, 3])
+        X, y = make_data(10, net.sizes)
+        net.evaluate(X, y, "Test")
+        assert capsys.readouterr().out.startswith("Test data: accuracy")
+
+
+class TestCallbacks:
+    def test_hooks(self, capsys):
+        calls = []
+
+        class Recorder(Callback):
+            def on_epoch_end(self, net, epoch):
+                calls.append(('epoch', epoch))
+
+            def on_batch_end(self, net, epoch, batch):
+                calls.append(('batch', epoch, batch))
+
+            def on_train_end(self, net):
+                calls.append('end')
+
+        net = Network([8, 6, 3])
+        net.epochs, net.batch_size = 2, 40
+        X, y = make_data(100, net.sizes)
+        net.SGD(X, y, callbacks=[Recorder()])
+        assert calls == [('batch', 0, 0), ('batch', 0, 1), ('epoch', 0),
+                         ('batch', 1, 0), ('batch', 1, 1), ('epoch', 1), 'end']
+        assert capsys.readouterr().out == ''
+
+    @pytest.mark.parametrize('background', ['thread', 'process'])
+    def test_background_same_as_foreground(self, background):
+        X, y = make_data(300, [8, 16, 3])
+        histories = []
+        for bg in [None, background]:
+            np.random.seed(8)
+            net = Network([8, 16, 3])
+            net.epochs, net.batch_size, net.in_place = 2, 10, True
+            ev = Evaluator({'Training': (X, y), 'Test': (X[:50], y[:50])}, every=10,
+                           subsample=100, background=bg, verbose=False)
+            net.SGD(X, y, callbacks=[ev])
+            histories.append(ev.history)
+        assert len(histories[0]) == 2 * 3 * 2
+        assert histories[0] == histories[1]
+
+    def test_process_with_prefetch(self, monkeypatch):
+        contexts = []
+
+        class Pool(callbacks.ProcessPoolExecutor):
+            def __init__(self, *args, **kwargs):
+                contexts.append(kwargs['mp_context'].get_start_method())
+                super().__init__(*args, **kwargs)
+
+        monkeypatch.setattr(callbacks, 'ProcessPoolExecutor', Pool)
+        X, y = make_data(300, [8, 16, 3])
+        histories = []
+        for bg in [None, 'process']:
+            np.random.seed(8)
+            net = Network([8, 16, 3])
+            net.epochs, net.batch_size = 2, 10
+            ev = Evaluator({'Test': (X, y)}, every=10, background=bg, verbose=False)
+            loader = BatchLoader(X, y, 10, prefetch=True, seed=0)
+            net.SGD(X, y, callbacks=[ev], loader=loader)
+            histories.append(ev.history)
+        assert histories[0] == histories[1]
+        assert contexts == ['forkserver']
+
+    def test_snapshot(self):
+        net = Network([8, 6, 3])
+        snap = net.snapshot()
+        net.weights[0] += 1
+        assert not np.allclose(snap.weights[0], net.weights[0])
+
+
+class TestParallel:
+    @pytest.mark.parametrize(
+        'dtype, master_dtype', [(np.float64, None), (np.float32, np.float64)]
+    )
+    def test_sync_same_as_serial(self, dtype, master_dtype):
+        X, y = make_data(300, [8, 16, 3])
+        nets = []
+        for parallel in [False, True]:
+            np.random.seed(10)
+            net = Network([8, 16, 3], dtype=dtype, master_dtype=master_dtype)
+            net.epochs, net.batch_size = 2, 25
+            if parallel:
+                parallel_SGD(net, X, y, callbacks=[], n_workers=3)
+            else:
+                net.SGD(X, y, callbacks=[])
+            nets.append(net)
+        for a, b in zip(nets[0].weights + nets[0].biases, nets[1].weights + nets[1].biases):
+            assert a.dtype == b.dtype == dtype
+            assert np.allclose(a, b, atol=1e-5)
+
+    def test_hogwild(self):
+        np.random.seed(11)
+        net = Network([8, 16, 3])
+        net.epochs, net.batch_size, net.eta = 5, 10, 3.0
+        X, y = make_data(600, net.sizes)
+        ev = Evaluator({'Training': (X, y)}, every=1, verbose=False)
+        parallel_SGD(net, X, y, callbacks=[ev], n_workers=2, hogwild=True)
+        assert len(ev.history) == net.epochs
+        assert net.evaluate(X, y) > 0.8
+
+
+class TestRegistry:
+    @pytest.mark.parametrize('kind', ['sigmoid', 'tanh', 'linear', 'relu'])
+    def test_derivative(self, kind):
+        act = get_activation(kind)
+        z = np.linspace(-2, 2, 9) + 0.05
+        eps = 1e-6
+        numeric = (act.forward(z + eps) - act.forward(z - eps)) / (2 * eps)
+        assert np.allclose(act.derivative(act.forward(z)), numeric, atol=1e-6)
+        out = np.empty_like(z)
+        assert act.derivative(act.forward(z), out=out) is out
+
+    @pytest.mark.parametrize(
+        'nl_kind, output_kind, loss',
+        [('relu', 'softmax', 'cross_entropy'), ('tanh', 'sigmoid', 'cross_entropy'),
+         ('relu', 'linear', 'mse')],
+    )
+    def test_numerical_gradient(self, nl_kind, output_kind, loss):
+        np.random.seed(12)
+        net = Network([4, 5, 3], nl_kind, output_kind=output_kind, loss=loss)
+        X, y = make_data(3, net.sizes)
+        nabla_w, nabla_b = net.backprop(X, y)
+        ws = net.workspace(3)
+        ws.x[...], ws.y[...] = X, y
+        nw, nb = net.backprop_into(ws)
+        assert all(np.allclose(a, b) for a, b in zip(nabla_w + nabla_b, nw + nb))
+
+        value = lambda: net.loss.value(net.forward(X)[-1], y, net.output_activation)
+        eps = 1e-6
+        for w, nabla in [(net.weights[0], nabla_w[0]), (net.biases[1], nabla_b[1])]:
+            for idx in [(0, 0), (0, 2)]:
+                w0 = w[idx]
+                w[idx] = w0 + eps
+                up = value()
+                w[idx] = w0 - eps
+                down = value()
+                w[idx] = w0
+                numeric = (up - down) / (2 * eps)
+                assert numeric == pytest.approx(nabla[idx], rel=1e-4, abs=1e-8)
+
+    @pytest.mark.parametrize('optimizer', ['sgd', 'momentum', Adam(eta=0.01)])
+    @pytest.mark.parametrize('in_place', [False, True])
+    def test_optimizers_learn(self, optimizer, in_place):
+        np.random.seed(13)
+        net = Network([8, 16, 3], 'relu', output_kind='softmax', loss='cross_entropy',
+                      optimizer=optimizer)
+        if isinstance(optimizer, str):
+            net.optimizer.eta = 0.5
+        net.epochs, net.batch_size, net.in_place = 5, 10, in_place
+        X, y = make_data(600, net.sizes)
+        net.SGD(X, y, callbacks=[])
+        assert net.evaluate(X, y) > 0.8
+
+    def test_bad_config(self):
+        with pytest.raises(ValueError):
+            Network([4, 3], output_kind='softmax')
+        with pytest.raises(ValueError):
+            Network([4, 3], 'relu', loss='cross_entropy')
+        with pytest.raises(ValueError):
+            Network([4, 3], 'swish')
+        with pytest.raises(ValueError):
+            Network([4, 3], optimizer='lbfgs')
+
+    def test_softmax_hidden(self):
+        with pytest.raises(ValueError, match='hidden'):
+            Network([4, 5, 3], 'softmax', output_kind='sigmoid', loss='cross_entropy')
+        # Without hidden layers, nl_kind only names the output activation.
+        Network([4, 3], 'softmax', loss='cross_entropy')
+
+
+class TestCheckpoint:
+    @pytest.mark.parametrize('mmap', [True, False])
+    @pytest.mark.parametrize('dtype', [np.float64, np.float32])
+    def test_roundtrip(self, tmp_path, mmap, dtype):
+        path = str(tmp_path / 'net.ckpt')
+        net = Network([8, 6, 3], 'relu', dtype=dtype, output_kind='softmax',
+                      loss='cross_entropy')
+        net.save(path)
+        loaded = Network.load(path, mmap=mmap)
+        assert loaded.sizes == net.sizes
+        assert loaded.dtype == net.dtype
+        assert loaded.output_activation.name == 'softmax'
+        assert loaded.loss.name == 'cross_entropy'
+        for a, b in zip(net.weights + net.biases, loaded.weights + loaded.biases):
+            assert np.array_equal(a, b)
+        X, _ = make_data(20, net.sizes)
+        assert np.array_equal(net.predict(X), loaded.predict(X))
+
+    @pytest.mark.parametrize('in_place, optimizer', [
+        (False, None), (True, None), (False, 'adam'), (True, 'momentum')
+    ])
+    def test_train_after_mmap(self, tmp_path, in_place, optimizer):
+        path = str(tmp_path / 'net.ckpt')
+        Network([8, 6, 3]).save(path)
+        before = pathlib.Path(path).read_bytes()
+        net = Network.load(path)
+        net.epochs, net.in_place = 1, in_place
+        if optimizer is not None:
+            net.optimizer = get_optimizer(optimizer)
+        X, y = make_data(100, net.sizes)
+        net.SGD(X, y, callbacks=[])
+        assert not np.array_equal(net.weights[0], Network.load(path).weights[0])
+        assert pathlib.Path(path).read_bytes() == before
+
+    def test_failed_save(self, tmp_path, monkeypatch):
+        path = tmp_path / 'net.ckpt'
+
+        def fail(src, dst):
+            raise OSError('disk full')
+
+        monkeypatch.setattr('os.replace', fail)
+        with pytest.raises(OSError):
+            Network([8, 6, 3]).save(str(path))
+        assert list(tmp_path.iterdir()) == []
+
+    def test_bad_file(self, tmp_path):
+        path = tmp_path / 'bad'
+        path.write_bytes(b'not a checkpoint')
+        with pytest.raises(ValueError):
+            Network.load(str(path))
+
+
+class TestProfiling:
+    @pytest.mark.parametrize('in_place', [False, True])
+    def test_metrics(self, in_place):
+        records = []
+        metrics = Metrics(on_metrics=records.append, trace_memory=True)
+        net = Network([8, 6, 3])
+        net.epochs, net.batch_size, net.in_place = 2, 10, in_place
+        X, y = make_data(105, net.sizes)
+        net.SGD(X, y, callbacks=[metrics])
+        assert records == metrics.history
+        assert [r['epoch'] for r in records] == [0, 1]
+        assert all(r['samples'] == 100 for r in records)
+        assert all(r['samples_per_sec'] > 0 for r in records)
+        assert set(records[0]['phases']) == set(PHASES)
+        assert all(t >= 0 for t in records[0]['phases'].values())
+        assert records[0]['peak_traced'] > 0
+        assert net.samples_seen == 200
+
+    def test_parallel_metrics(self):
+        metrics = Metrics()
+        net = Network([8, 6, 3])
+        net.epochs, net.batch_size = 1, 10
+        X, y = make_data(100, net.sizes)
+        parallel_SGD(net, X, y, callbacks=[metrics], n_workers=2, hogwild=True)
+        assert metrics.history[0]['samples'] == 100
+
+    @pytest.mark.parametrize('platform, scale', [('linux', 1024), ('darwin', 1)])
+    def test_peak_rss(self, monkeypatch, platform, scale):
+        if profiling.resource is None:
+            pytest.skip('no resource module')
+        monkeypatch.setattr(profiling.sys, 'platform', platform)
+        monkeypatch.setattr(profiling.resource, 'getrusage',
+                            lambda who: type('rusage', (), {'ru_maxrss': 1000}))
+        assert profiling.peak_rss() == 1000 * scale
+
+    def test_profile(self, tmp_path):
+        net = Network([8, 6, 3])
+        net.epochs = 1
+        X, y = make_data(100, net.sizes)
+        output = str(tmp_path / 'sgd.prof')
+        stats = profile_SGD(net, X, y, callbacks=[], output=output)
+        assert any(func[2] == 'backprop' for func in stats.stats)
+        assert (tmp_path / 'sgd.prof').exists()
+
+
+class TestBatchLoader:
+    @pytest.mark.parametrize('prefetch', [False, True])
+    @pytest.mark.parametrize('drop_last, sizes', [(False, [10, 10, 3]), (True, [10, 10])])
+    def test_epoch(self, prefetch, drop_last, sizes):
+        X = np.arange(23 * 2, dtype=np.float64).reshape(23, 2)
+        y = np.arange(23)
+        loader = BatchLoader(X, y, 10, drop_last=drop_last, prefetch=prefetch, seed=0)
+        assert len(loader) == len(sizes)
+        for _ in range(2):
+            rows = []
+            for x_batch, y_batch in loader:
+                assert np.array_equal(x_batch[:, 0], 2 * y_batch)
+                rows.append(y_batch.copy())
+            assert [len(r) for r in rows] == sizes
+            rows = np.concatenate(rows)
+            assert len(set(rows)) == len(rows)
+            if not drop_last:
+                assert sorted(rows) == list(range(23))
+
+    def test_seed_and_prefetch(self):
+        X, y = make_data(50, [4, 3])
+        runs = []
+        for prefetch in [False, True]:
+            loader = BatchLoader(X, y, 8, prefetch=prefetch, seed=42)
+            runs.append([x.copy() for _ in range(3) for x, _ in loader])
+        assert all(np.array_equal(a, b) for a, b in zip(*runs))
+        # Consecutive epochs are shuffled differently.
+        assert not np.array_equal(runs[0][0], runs[0][7])
+
+    def test_buffers_reused(self):
+        X, y = make_data(30, [4, 3])
+        loader = BatchLoader(X.astype(np.float32), y, 10, shuffle=False, dtype=np.float64)
+        batches = list(loader)
+        assert batches[0][0].dtype == np.float64
+        assert all(np.shares_memory(b[0], batches[0][0]) for b in batches)
+        assert np.allclose(batches[-1][0], X[20:])
+
+    def test_early_stop(self):
+        X, y = make_data(100, [4, 3])
+        loader = BatchLoader(X, y, 10, prefetch=True)
+        for i, _ in enumerate(loader):
+            if i == 2:
+                break
+        assert threading.active_count() == 1
+
+    def test_sgd_with_loader(self):
+        np.random.seed(14)
+        net = Network([8, 16, 3])
+        net.epochs, net.eta, net.in_place = 5, 3.0, True
+        X, y = make_data(605, net.sizes)
+        loader = BatchLoader(X, y, 10, prefetch=True, seed=1, dtype=net.dtype)
+        metrics = Metrics()
+        net.SGD(X, y, callbacks=[metrics], loader=loader)
+        assert metrics.history[0]['samples'] == 605
+        assert net.evaluate(X, y) > 0.8
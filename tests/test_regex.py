@@ -0,0 +1,319 @@
+from bfalgo.regex import nfa
+from bfalgo.regex.dfa import DFA
+from bfalgo.regex.flat import FlatNFA
+from bfalgo.regex.pike import PikeVM
+from bfalgo.regex.prefilter import Prefilter
+from bfalgo.regex import pattern
+from bfalgo.regex.pattern_set import PatternSet
+from bfalgo.regex.stream import match_file
+from bfalgo.regex import benchmark
+import json
+import pytest
+
+
+CASES = [
+    ('a(b|c)*d', 'abcbd', True),
+    ('a(b|c)*d', 'ad', True),
+    ('a(b|c)*d', 'abxd', False),
+    ('(ab)?ba', 'ba', True),
+    ('(ab)?ba', 'abba', True),
+    ('(ab)?ba', 'aba', False),
+    ('a(bb)+a', 'abbbba', True),
+    ('a(bb)+a', 'abbba', False),
+    ('a(bb)?c*b|abc', 'abbcccb', True),
+    ('a(bb)?c*b|abc', 'abc', True),
+    ('a(bb)?c*b|abc', 'ab', True),
+    ('a(bb)?c*b|abc', 'abbc', False),
+    ('(a*)*b', 'aaab', True),
+    ('(a*)*b', 'aaa', False),
+    ('[a-c]+\\.x', 'abca.x', True),
+    ('[a-c]+\\.x', 'abdax', False),
+    ('[^a]b.', 'bbz', True),
+    ('[^a]b.', 'abz', False),
+    ('a.c', 'a\nc', False),
+    ('\\d+(\\s\\w+)?', '42 ms', True),
+    ('\\d+(\\s\\w+)?', '42 m-s', False),
+    ('\\x61[]b-]*', 'a]-b', True),
+    ('\\(\\*\\)', '(*)', True),
+]
+
+
+class TestRegexToPostfix:
+    @pytest.mark.parametrize(
+        'reg, postfix',
+        [
+            ('(ab)?ba', 'ab.?b.a.'),
+            ('a(bb)+a', 'abb.+.a.'),
+            ('a(bb)?c*b|abc', 'abb.?.c*.b.ab.c.|'),
+            ('a(b|c)c*a+|abc|a(a+)', 'abc|.c*.a+.ab.c.aa+.||'),
+        ],
+    )
+    def test_postfix(self, reg, postfix):
+        assert nfa.regex_to_postfix(reg) == postfix
+
+    @pytest.mark.parametrize(
+        'reg, postfix',
+        [
+            ('[a-c]+\\.x', '[a-c]+\\..x.'),
+            ('a.b', 'a[^\\n].b.'),
+            ('\\d(x|\\|)', '\\dx\\||.'),
+        ],
+    )
+    def test_postfix_classes(self, reg, postfix):
+        assert nfa.regex_to_postfix(reg) == postfix
+
+    @pytest.mark.parametrize(
+        'reg', ['(ab', 'ab)', '*a', 'a||b', '()', '[ab', 'a\\', '[z-a]', '\\xg0']
+    )
+    def test_bad_regex(self, reg):
+        assert nfa.regex_to_postfix(reg) is None
+
+
+class TestMatch:
+    @pytest.mark.parametrize('reg, string, result', CASES)
+    def test_nfa(self, reg, string, result):
+        start = nfa.postfix_to_nfa(nfa.regex_to_postfix(reg))
+        assert bool(nfa.match(start, string)) == result
+
+    @pytest.mark.parametrize('reg, string, result', CASES)
+    def test_dfa(self, reg, string, result):
+        dfa = DFA(nfa.postfix_to_nfa(nfa.regex_to_postfix(reg)))
+        assert dfa.match(string) == result
+        # Second run goes through the memoized transitions.
+        assert dfa.match(string.encode()) == result
+
+    @pytest.mark.parametrize('reg, string, result', CASES)
+    def test_flat(self, reg, string, result):
+        states = []
+        start = nfa.postfix_to_nfa(nfa.regex_to_postfix(reg), states)
+        assert FlatNFA.from_states(states, start).match(string) == result
+        assert FlatNFA.from_nfa(start).match(string) == result
+
+    @pytest.mark.parametrize('reg, string, result', CASES)
+    def test_pike(self, reg, string, result):
+        assert PikeVM(pattern.Pattern(reg).flat).match(string) == result
+
+    @pytest.mark.parametrize('n', [5, 25])
+    def test_pathological(self, n):
+        # a?^n a^n against a^n: 2^n paths, but at most one thread per state.
+        p = pattern.Pattern('a?' * n + 'a' * n)
+        assert p.match('a' * n, engine='pike')
+        assert p.match('a' * n, engine='nfa')
+        assert not p.match('a' * (2 * n + 1), engine='pike')
+
+        start = nfa.postfix_to_nfa(nfa.regex_to_postfix('(a|a)*'))
+        clist = []
+        nfa.addstate(clist, start)
+        for _ in range(n):
+            clist = nfa.step(clist, ord('a'))
+        assert len(clist) == len(set(clist)) == 3
+
+    def test_deep_nesting(self):
+        depth = 5000
+        p = pattern.Pattern('(' * depth + 'a*' + ')*' * depth + 'b')
+        assert len(p.flat) == 3 * depth + 4  # split + two saves per group
+        assert p.match('aaab', engine='flat')
+        assert p.match('aaab', engine='pike')
+        assert p.match('aaab')
+        assert not p.match('aaa')
+
+    def test_dfa_cache_flush(self):
+        dfa = DFA(nfa.postfix_to_nfa(nfa.regex_to_postfix('(a|b)*a(a|b)(a|b)(a|b)')), max_mem=1)
+        for string, result in [('abbbabab', True), ('aabbbb', False), ('baaab', True)]:
+            assert dfa.match(string) == result
+        assert dfa.cache_resets > 0
+        assert len(dfa.cache) == 1
+
+    def test_byte_classes(self):
+        dfa = DFA(nfa.postfix_to_nfa(nfa.regex_to_postfix('[a-c]+\\.x')))
+        # [a-c], '.', 'x', and every other byte
+        assert dfa.nclasses == 4
+        assert dfa.match('cab.x') and not dfa.match('cab.y')
+
+
+class TestCompile:
+    def setup_method(self):
+        pattern.purge()
+        pattern.set_cache_size(2)
+
+    def teardown_method(self):
+        pattern.set_cache_size(512)
+        pattern.purge()
+
+    def test_cache(self):
+        p = pattern.compile('a(b|c)*d')
+        assert pattern.compile('a(b|c)*d') is p
+        assert p.match('abcbd') and p.match('abcbd', engine='nfa')
+        assert pattern.cache_info() == (1, 1, 2, 1)
+
+        pattern.compile('ab')
+        pattern.compile('a(b|c)*d')
+        pattern.compile('ba')  # evicts 'ab', the least recently used
+        assert pattern.compile('a(b|c)*d') is p
+        assert pattern.cache_info() == (3, 3, 2, 2)
+
+    def test_immutable(self):
+        p = pattern.compile('ab')
+        with pytest.raises(AttributeError):
+            p.postfix = 'ba.'
+        assert p.postfix == 'ab.'
+        assert [s.state_id for s in p.states] == [0, 1, 2]
+
+    @pytest.mark.parametrize('regex', ['a||b', 'a|', '|a', '(a|)b', 'a|b|'])
+    def test_bad_regex(self, regex):
+        with pytest.raises(ValueError):
+            pattern.compile(regex)
+        with pytest.raises(ValueError):
+            PatternSet([regex])
+
+
+class TestSearch:
+    @pytest.mark.parametrize(
+        'reg, string',
+        [
+            ('a(b|c)*d', 'xxabcbdyy ad'),
+            ('((a)b)|(c)', 'zzcab'),
+            ('(a|ab)(c|bcd)(d*)', 'abcd'),
+            ('(a+)+b', 'caab'),
+            ('a*', 'baab'),
+            ('a*|b', 'bab'),
+            ('x(y)?', 'xyx'),
+            ('ab', 'acd'),
+        ],
+    )
+    def test_against_re(self, reg, string):
+        import re
+
+        p = pattern.compile(reg)
+        m = p.search(string)
+        expected = re.search(reg, string)
+        if expected is None:
+            assert m is None
+        else:
+            assert m.span() == expected.span()
+            assert m.groups() == expected.groups()
+        assert [m.span() for m in p.finditer(string)] == [
+            m.span() for m in re.finditer(reg, string)
+        ]
+        assert p.findall(string) == re.findall(reg, string)
+        assert p.findall(string.encode()) == re.findall(reg.encode(), string.encode())
+
+    def test_postfix_captures(self):
+        assert nfa.regex_to_postfix('(ab)?ba', captures=True) == 'ab.)?b.a.'
+        assert pattern.compile('((a)b)|(c)').groups == 3
+
+
+class TestPatternSet:
+    PATTERNS = ['error(x|y)+timeout', 'abc', 'a(b|c)*d', 'b+', '(ab)?ba']
+
+    @pytest.mark.parametrize('anchored', [True, False])
+    @pytest.mark.parametrize(
+        'string', ['abc', 'abcbd', 'bbb', 'ba', 'errorxyxtimeout', 'xx errorytimeout abc', '']
+    )
+    def test_against_single_patterns(self, anchored, string):
+        import re
+
+        ps = PatternSet(self.PATTERNS, anchored=anchored)
+        find = re.fullmatch if anchored else re.search
+        expected = [i for i, p in enumerate(self.PATTERNS) if find(p, string)]
+        assert ps.match(string) == expected
+        assert ps.match(string, engine='nfa') == expected
+
+    def test_bad_regex(self):
+        with pytest.raises(ValueError):
+            PatternSet(['ab', 'a||b'])
+
+
+class TestStream:
+    @pytest.mark.parametrize('reg, string, result', CASES)
+    def test_chunks(self, reg, string, result):
+        p = pattern.compile(reg)
+        m = p.matcher()
+        for i in range(0, len(string), 2):
+            m.feed(memoryview(string[i:i + 2].encode()))
+        assert m.finish() == result
+
+    def test_stop_early(self):
+        p = pattern.compile('ab')
+        m = p.matcher()
+        assert m.feed(b'ac')
+        assert m.feed(b'ab') and m.nbytes == 2
+        assert not m.finish()
+
+        m = p.matcher(anchored=False)
+        assert not m.feed(bytearray(b'xxa'))
+        assert m.feed(b'bxxxx') and m.nbytes == 4
+        assert m.finish()
+
+    def test_file(self, tmp_path):
+        import io
+
+        path = tmp_path / 'log.txt'
+        path.write_bytes(b'x' * 5000 + b'errorxytimeout' + b'y' * 5000)
+        ps = PatternSet(['error(x|y)+timeout', 'abc', 'y+'], anchored=False)
+        m = match_file(ps.dfa, str(path), chunk_size=1000)
+        assert m.matches == [0, 2] and m.finish()
+
+        m = pattern.compile('x*errorxy(timeout)y*').matcher()
+        assert m.feed_file(io.BytesIO(path.read_bytes()), chunk_size=1000)
+        assert m.nbytes == 10014
+
+        (tmp_path / 'empty.txt').write_bytes(b'')
+        assert not match_file(ps.dfa, str(tmp_path / 'empty.txt')).finish()
+
+
+class TestPrefilter:
+    @pytest.mark.parametrize(
+        'reg, prefix, required',
+        [
+            ('error(x|y)+timeout', b'error', [(b'timeout',), (b'error',), (b'x', b'y')]),
+            ('abc', b'abc', [(b'abc',)]),
+            ('a(b|c)d', b'a', [(b'abd', b'acd')]),
+            ('(ab)?ba', b'', [(b'abba', b'ba')]),
+            ('a*', b'', []),
+            ('(ab)+c|abd', b'ab', [(b'abc', b'abd')]),
+        ],
+    )
+    def test_analyze(self, reg, prefix, required):
+        f = Prefilter(nfa.regex_to_postfix(reg, captures=True))
+        assert f.prefix == prefix
+        assert sorted(f.required) == sorted(required)
+
+    def test_may_match(self):
+        f = Prefilter(nfa.regex_to_postfix('error(x|y)+timeout'))
+        assert f.may_match(b'.. errorxtimeout ..')
+        assert not f.may_match(b'.. error timeout ..')
+        assert not f.may_match(b'.. errorxtimeout ..', anchored=True)
+        assert not f.may_match(b'errorxtimeout', 1)
+
+    @pytest.mark.parametrize('string', ['zz errorxyxtimeout', 'errorxytimeout', 'error timeout'])
+    def test_pattern(self, string):
+        import re
+
+        p = pattern.compile('error(x|y)+timeout')
+        assert p.match(string) == bool(re.fullmatch(p.pattern, string))
+        assert p.findall(string) == re.findall(p.pattern, string)
+        assert p.findall(memoryview(string.encode())) == re.findall(p.pattern.encode(), string.encode())
+
+    def test_memoryview_groups(self):
+        p = pattern.compile('error(x|y)+timeout')
+        m = p.search(memoryview(b'zz errorxyxtimeout'))
+        assert type(m.group()) is bytes and m.group() == b'errorxyxtimeout'
+        assert m.groups() == (b'x',) and type(m.groups()[0]) is bytes
+        assert all(type(g) is bytes for g in p.findall(memoryview(b'errorxtimeout')))
+
+
+class TestBenchmark:
+    def test_quick_run(self, tmp_path):
+        out = tmp_path / "bench.json"
+        assert benchmark.main(["--quick", "--out", str(out)]) == 0
+        report = json.loads(out.read_text())
+        workloads = {r["workload"] for r in report["results"]}
+        assert workloads == {"compile", "pathological", "log", "multi"}
+        assert all(r["seconds"] >= 0 for r in report["results"])
+
+    def test_compare(self):
+        entry = {"workload": "log", "name": "ERROR", "engine": "dfa", "bytes": 10}
+        baseline = {"results": [dict(entry, seconds=1.0)]}
+        assert benchmark.compare(baseline, {"results": [dict(entry, seconds=1.1)]}) == []
+        assert len(benchmark.compare(baseline, {"results": [dict(entry, seconds=2.0)]})) == 1